@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'matchVersion1')))
+
+from person_matching_functions import (custom_costs, dynamic_max_distance, match_names_score,
+                                       match_names_score_batch, modified_levenshtein_distance,
+                                       modified_levenshtein_distance_batch, normalize_spanish_names)
+
+class TestBatchNameScores(unittest.TestCase):
+
+    names = ["José", "Jose", "Jos", "María Antonia", "Maria Antonio", "Juana Jesús", "Jvana Jesus",
+             "Maximiliano Rodriguez", "Maxsimiliano Rodrigues", "Ygnacio", "Ignacio", "Zúñiga, de",
+             "Francisco Xavier Garcia", "Vicente", "", None, np.nan, "abcdefghijklmnopqrstuvwxyz", "z"]
+
+    def test_scores_match_scalar(self):
+        pairs = [(name1, name2) for name1 in self.names for name2 in self.names]
+        expected = np.array([match_names_score(name1, name2) for name1, name2 in pairs], dtype=float)
+        scores = match_names_score_batch([pair[0] for pair in pairs], [pair[1] for pair in pairs])
+        self.assertEqual(scores.tobytes(), expected.tobytes())
+
+    def test_distances_match_scalar_cutoff(self):
+        normalized = [normalize_spanish_names(name) for name in self.names if isinstance(name, str)]
+        names1 = [name1 for name1 in normalized for name2 in normalized]
+        names2 = [name2 for name1 in normalized for name2 in normalized]
+        cutoffs = np.array([dynamic_max_distance(name1, name2) for name1, name2 in zip(names1, names2)], dtype=float)
+        expected = [modified_levenshtein_distance(name1, name2, custom_costs, cutoff)
+                    for name1, name2, cutoff in zip(names1, names2, cutoffs)]
+        distances = modified_levenshtein_distance_batch(names1, names2, custom_costs, cutoffs, batch_size=7)
+        self.assertEqual(distances.tolist(), [float(distance) for distance in expected])
+
+    def test_empty_input(self):
+        self.assertEqual(len(match_names_score_batch([], [])), 0)
+
+if __name__ == '__main__':
+    unittest.main()
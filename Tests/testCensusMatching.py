@@ -0,0 +1,41 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'newPeopleMatchAlgo')))
+
+from peopleMatchAlgo import Node, match_person_across_census, match_persons_across_census
+
+class TestCensusMatching(unittest.TestCase):
+
+    names = ["jose lopez", "josef lopes", "juan llanos", "juana yanos", "maria garcia", "marya garsia",
+             "ygnacio hernandez", "ignacio ernandez"]
+
+    def census(self, count, seed):
+        generator = random.Random(seed)
+        nodes = []
+        for _ in range(count):
+            node = Node({"name": generator.choice(self.names)}, "padron_1781")
+            node.info["age"] = generator.choice([None, generator.randint(0, 60)])
+            node.spouse = generator.choice([None, "Unknown Spouse", Node({"name": generator.choice(self.names)})])
+            nodes.append(node)
+        return nodes
+
+    def test_same_ordering_as_single_person(self):
+        persons = self.census(30, seed=1)
+        other = self.census(60, seed=2) + persons[:5]
+        expected = [match_person_across_census(person, other, 4) for person in persons]
+        self.assertTrue(any(len(matches) > 1 for matches in expected))
+        for max_workers in (1, 3):
+            for top_k in (None, 2):
+                result = match_persons_across_census(persons, other, 4, top_k=top_k, max_workers=max_workers)
+                self.assertEqual(result, [matches[:top_k] for matches in expected])
+
+    def test_empty_census(self):
+        persons = self.census(3, seed=4)
+        self.assertEqual(match_persons_across_census(persons, [], 4, max_workers=2), [[], [], []])
+        self.assertEqual(match_persons_across_census([], persons, 4, max_workers=2), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import glob
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'matchVersion1')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import checkpoints
+import match_person_parallel_functions
+from benchmark_matching import SyntheticRecords
+from checkpoints import CheckpointStore, frame_hash
+from data_processing import add_identifiers, get_config
+from match_person_parallel_functions import MatchingPool
+from match_persons_script import match_dataset
+
+configure_and_match = match_person_parallel_functions.configure_and_match
+
+
+def failing_unless(allowed):
+    """configure_and_match that fails every census chunk whose first row is not in allowed."""
+    def match(census, baptisms, config):
+        if census.index[0] not in allowed:
+            raise ValueError(f"chunk at {census.index[0]} must not be matched")
+        return configure_and_match(census, baptisms, config)
+    return match
+
+
+class TestCheckpoints(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        records = SyntheticRecords(seed=0)
+        cls.census = records.census_1790(60)
+        cls.baptisms = records.baptisms(100)
+        add_identifiers(cls.census, 'ecpp_id')
+        add_identifiers(cls.baptisms, '#ID')
+        cls.config = get_config()
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def match(self, checkpoint_scope, stream, directory):
+        # Workers are forked when the pool starts, so they see configure_and_match as patched at that time.
+        with MatchingPool(self.baptisms, self.config, processes=2, tasks_per_worker=2) as pool:
+            return match_dataset(pool, self.census, 'afro_1790_census', stream, 3, None,
+                                 os.path.join(directory, 'candidates.csv'), checkpoint_scope)
+
+    def test_failed_chunk_then_rerun(self):
+        for stream in (False, True):
+            with self.subTest(stream=stream), tempfile.TemporaryDirectory() as directory:
+                expected = self.match(None, stream, directory)
+                store = CheckpointStore(os.path.join(directory, 'checkpoints'))
+                scope = store.scope('afro_1790_census', frame_hash(self.baptisms), stream)
+                scope_files = os.path.join(store.directory, 'afro_1790_census')
+
+                everything_but_first = set(self.census.index) - {0}
+                with mock.patch.object(match_person_parallel_functions, 'configure_and_match',
+                                       failing_unless(everything_but_first)):
+                    with self.assertRaises(RuntimeError):
+                        self.match(scope, stream, directory)
+                self.assertEqual(glob.glob(os.path.join(scope_files, 'dataset-*')), [])
+                saved_chunks = len(glob.glob(os.path.join(scope_files, 'chunk-*')))
+                self.assertGreater(saved_chunks, 0)
+
+                # Only the failed chunk may be matched again; the finished ones must come from their checkpoints.
+                with mock.patch.object(match_person_parallel_functions, 'configure_and_match', failing_unless({0})):
+                    result = self.match(scope, stream, directory)
+                pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+                self.assertEqual(len(glob.glob(os.path.join(scope_files, 'chunk-*'))), saved_chunks + 1)
+                self.assertEqual(len(glob.glob(os.path.join(scope_files, 'dataset-*'))), 1)
+
+    def test_changed_inputs_are_not_reused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = CheckpointStore(directory)
+            inputs = (frame_hash(self.baptisms), self.config['census_config'], False, 3, None)
+            result = pd.DataFrame({'ecpp_id': [1, 2], '#ID': [3, 4]})
+            store.scope('afro_1790_census', *inputs).save_dataset(self.census, result)
+            store.scope('afro_1790_census', *inputs).save_chunk(self.census.iloc[:30], result)
+
+            pd.testing.assert_frame_equal(store.scope('afro_1790_census', *inputs).load_dataset(self.census), result)
+            pd.testing.assert_frame_equal(store.scope('afro_1790_census', *inputs).load_chunk(self.census.iloc[:30]),
+                                          result)
+
+            changed_census = self.census.copy()
+            changed_census.loc[0, 'First'] = 'Changed'
+            changed_config = dict(self.config['census_config'], ecpp_id_col='other_id')
+            self.assertIsNone(store.scope('afro_1790_census', *inputs).load_dataset(changed_census))
+            self.assertIsNone(store.scope('afro_1790_census', *inputs).load_chunk(changed_census.iloc[:30]))
+            self.assertIsNone(store.scope('afro_1790_census', frame_hash(self.baptisms.iloc[1:]), *inputs[1:])
+                              .load_dataset(self.census))
+            self.assertIsNone(store.scope('afro_1790_census', inputs[0], changed_config, *inputs[2:])
+                              .load_dataset(self.census))
+            self.assertIsNone(store.scope('afro_1790_census', *inputs[:2], True, *inputs[3:]).load_dataset(self.census))
+            self.assertIsNone(store.scope('padron_1781', *inputs).load_dataset(self.census))
+            with mock.patch.object(checkpoints, 'MATCHING_VERSION', checkpoints.MATCHING_VERSION + 1):
+                self.assertIsNone(store.scope('afro_1790_census', *inputs).load_dataset(self.census))
+                self.assertIsNone(store.scope('afro_1790_census', *inputs).load_chunk(self.census.iloc[:30]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nameMatching import DistanceEngine, bounded_distance, colonial_costs, distance
+
+class TestDistanceEngine(unittest.TestCase):
+
+    def test_multi_character_rules(self):
+        self.assertEqual(distance("joseph", "jose", colonial_costs), 1)
+        self.assertEqual(distance("llanos", "yanos", colonial_costs), 0)
+        self.assertEqual(distance("yanos", "llanos", colonial_costs), 0)
+        self.assertEqual(distance("phelipe", "jelipe", colonial_costs), 0)
+
+    def test_free_h(self):
+        self.assertEqual(distance("hernandez", "ernandez", colonial_costs), 0)
+        self.assertEqual(distance("juan", "juhan", colonial_costs), 0)
+        self.assertEqual(distance("", "hh", colonial_costs), 0)
+
+    def test_single_character_rules_unchanged(self):
+        self.assertEqual(distance("vivir", "bibir", colonial_costs), 0)
+        self.assertEqual(distance("vaca", "bacas", colonial_costs), 1)
+        self.assertEqual(distance("zorro", "sorroo", colonial_costs), 1)
+        self.assertEqual(distance("maria", "mario", colonial_costs), 1)
+        self.assertEqual(distance("ana", "", colonial_costs), 3)
+
+    def test_bounded_matches_full_distance(self):
+        names = ["joseph maria", "jose maria", "josef", "llanos", "yanos", "hernandez", "ernandez", "fernando",
+                 "hhhana", "ana", "phelipe", "felipe", "guillermo", "giyermo", "castillo", ""]
+        for name1 in names:
+            for name2 in names:
+                full_distance = distance(name1, name2, colonial_costs)
+                for max_distance in range(4):
+                    expected = full_distance if full_distance <= max_distance else max_distance + 1
+                    self.assertEqual(bounded_distance(name1, name2, max_distance, colonial_costs), expected,
+                                     (name1, name2, max_distance))
+
+    def test_fractional_cutoff(self):
+        self.assertEqual(bounded_distance("maximiliano", "maxsimiliano", 5.6), 1)
+        self.assertEqual(bounded_distance("abcdefghij", "z", 5.4), 6.4)
+
+    def test_plain_table(self):
+        engine = DistanceEngine({})
+        self.assertEqual(engine.distance("kitten", "sitting"), 3)
+        self.assertEqual(engine.distance("kitten", "sitting", 1), 2)
+        self.assertEqual(DistanceEngine(colonial_costs).max_rule_length, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import logging
+import os
+import sys
+import unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'matchVersion1')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from benchmark_matching import SyntheticRecords
+from data_processing import add_identifiers, get_config
+from incremental import appended_start, row_fingerprints
+from match_person_parallel_functions import MatchingPool, empty_candidates
+from match_persons_script import collect_stream, match_dataset_incrementally
+
+
+class TestIncrementalMatching(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        records = SyntheticRecords(seed=3)
+        cls.census = records.census_1790(50)
+        cls.baptisms = records.baptisms(100)
+        add_identifiers(cls.census, 'ecpp_id')
+        add_identifiers(cls.baptisms, '#ID')
+        cls.config = get_config()
+        cls.pool = MatchingPool(cls.baptisms, cls.config, processes=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        logging.disable(logging.NOTSET)
+
+    def full_run(self, top_k):
+        return collect_stream(self.pool, self.census, 'afro_1790_census', 3, top_k)
+
+    def previous_run(self, census_start, baptisms_start, top_k):
+        """Candidates of a run that only had the rows before census_start and baptisms_start."""
+        with MatchingPool(self.baptisms.iloc[:baptisms_start], self.config, processes=2) as pool:
+            return collect_stream(pool, self.census.iloc[:census_start], 'afro_1790_census', 3, top_k)
+
+    def incremental_run(self, previous, census_start, baptisms_start, top_k):
+        return match_dataset_incrementally(self.pool, self.census, 'afro_1790_census', 3, top_k,
+                                           self.config['census_config'], previous, census_start, baptisms_start)
+
+    def test_appended_rows_match_full_run(self):
+        for top_k in (None, 2):
+            expected = self.full_run(top_k)
+            self.assertGreater(len(expected), 0)
+            for census_start, baptisms_start in [(40, 100), (50, 80), (40, 80)]:
+                with self.subTest(top_k=top_k, census_start=census_start, baptisms_start=baptisms_start):
+                    previous = self.previous_run(census_start, baptisms_start, top_k)
+                    result = self.incremental_run(previous, census_start, baptisms_start, top_k)
+                    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+    def test_no_new_rows(self):
+        for top_k in (None, 2):
+            with self.subTest(top_k=top_k):
+                expected = self.full_run(top_k)
+                result = self.incremental_run(expected, len(self.census), len(self.baptisms), top_k)
+                pd.testing.assert_frame_equal(result, expected.reset_index(drop=True))
+
+        # Nothing matched before and nothing appended: still a typed, empty candidates frame.
+        expected = empty_candidates('ecpp_id', '#ID')
+        result = self.incremental_run(expected, len(self.census), len(self.baptisms), None)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_appended_start(self):
+        fingerprints = row_fingerprints(self.census, 'ecpp_id')
+        self.assertEqual(appended_start(fingerprints[:40], fingerprints), 40)
+        self.assertEqual(appended_start(fingerprints, fingerprints), len(fingerprints))
+        self.assertIsNone(appended_start(None, fingerprints))
+        self.assertIsNone(appended_start(fingerprints[1:41], fingerprints))
+        self.assertIsNone(appended_start(fingerprints, fingerprints[:40]))
+
+if __name__ == '__main__':
+    unittest.main()
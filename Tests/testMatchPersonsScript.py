@@ -0,0 +1,129 @@
+import os
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'matchVersion1')))
+
+from match_persons_script import combine_parental_matches, insert_matched_values
+
+COLUMNS = ['#ID', 'ecpp_id', 'Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score',
+           'Matched_Criteria', 'match_type', 'dataset_key']
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+class TestCombineParentalMatches(unittest.TestCase):
+
+    # Expected rows follow the old groupby.apply version: NaN counts as a value (it is truthy),
+    # '' and None do not, and only a 'Direct' match type takes priority over the parents.
+    matches = frame([
+        [6, 60, 0, 3, 0, 'First Name', 'mother', 'padron_1821'],
+        [1, 10, 4, 0, 0, 'First Name, Last Name', 'direct', 'afro_1790_census'],
+        [2, 20, 0, 3, 0, 'Last Name', 'mother', 'padron_1781'],
+        [2, 20, 0, 0, 4, 'First Name', 'father', 'padron_1781'],
+        [3, 30, 3, 0, 0, '', 'direct', 'padron_1785'],
+        [3, 30, 0, 4, 0, np.nan, 'mother', 'padron_1785'],
+        [3, 30, 0, 0, 3, 'Age', 'father', 'padron_1785'],
+        [4, 40, 0, 3, 0, '', 'mother', 'padron_1821'],
+        [4, 40, 0, 0, 5, '', 'father', 'padron_1821'],
+        [5, 50, 0, 3, 3, 'Gender', 'mother_father', 'padron_267'],
+        [5, 60, 0, 0, 3, None, 'father', 'padron_267'],
+        [np.nan, 70, 4, 0, 0, 'Age', 'direct', 'afro_1790_census'],
+        [6, 60, 0, 4, 0, 'Age', 'mother', 'padron_1821'],
+        [7, 70, 3, 0, 0, 'First Name', 'direct', 'padron_1781'],
+        [7, 70, 0, 0, 3, 'Age', 'father', 'padron_1781'],
+        [8, 80, 4, 0, 0, 'Last Name', 'Direct', 'padron_1785'],
+        [8, 80, 0, 3, 0, 'Gender', 'mother', 'padron_1785'],
+    ])
+
+    expected = frame([
+        [1, 10, 4, 0, 0, 'First Name, Last Name', 'direct', 'afro_1790_census'],
+        [2, 20, 0, 3, 4, 'Last Name', 'mother_father', 'padron_1781'],
+        [3, 30, 3, 4, 3, np.nan, 'mother_father', 'padron_1785'],
+        [4, 40, 0, 3, 5, '', 'mother_father', 'padron_1821'],
+        [5, 50, 0, 3, 3, 'Gender', 'mother_father', 'padron_267'],
+        [5, 60, 0, 0, 3, None, 'father', 'padron_267'],
+        [6, 60, 0, 4, 0, 'First Name', 'mother_father', 'padron_1821'],
+        [7, 70, 3, 0, 3, 'Age', 'mother_father', 'padron_1781'],
+        [8, 80, 4, 3, 0, 'Last Name', 'mother_father', 'padron_1785'],
+    ])
+
+    def test_combined_rows(self):
+        result = combine_parental_matches(self.matches)
+        self.assertEqual(list(result.columns), COLUMNS)
+        pd.testing.assert_frame_equal(result.astype(object), self.expected.astype(object), check_dtype=False)
+
+    def test_without_repeated_pairs(self):
+        single = self.matches.drop_duplicates(['#ID', 'ecpp_id'], keep=False).dropna(subset=['#ID'])
+        result = combine_parental_matches(single)
+        expected = single.sort_values(['#ID', 'ecpp_id']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+NAN = np.nan
+BAPTISM_FIELDS = ['Date', 'Mission', 'Sex', 'Place', 'Notes', 'SpanishName', 'Surname', 'Ethnicity',
+                  'FSpanishName', 'FSurname', 'FMilitaryStatus', 'FOrigin', 'FEthnicity',
+                  'MSpanishName', 'MSurname', 'MOrigin', 'MEthnicity']
+
+
+def value(field, baptism_id):
+    return f"{field}-{baptism_id}"
+
+
+class TestInsertMatchedValues(unittest.TestCase):
+
+    def datasets(self):
+        baptisms = pd.DataFrame({'#ID': [1, 2, 3], **{field: [value(field, baptism_id) for baptism_id in [1, 2, 3]]
+                                                      for field in BAPTISM_FIELDS}})
+        baptisms.loc[1, ['Surname', 'MEthnicity']] = ['', NAN]
+        baptisms.loc[2, ['Notes', 'FEthnicity']] = [NAN, '']
+        census = pd.DataFrame({'ecpp_id': [10, 20, 30], 'Race': ['mulato', '', NAN]})
+        return {'baptisms': baptisms, 'afro_1790_census': census}
+
+    matches = pd.DataFrame({
+        '#ID': [1, 2, 3, 2, 3],
+        'ecpp_id': [10, 20, 30, 10, 20],
+        'Matched_Criteria': ['First Name', '', NAN, 'Age', 'Gender'],
+        'match_type': ['direct', 'mother', 'father', 'mother_father', 'direct'],
+        'dataset_key': ['afro_1790_census', 'padron_1781', 'padron_1785', 'padron_1821', 'padron_267']
+    })
+
+    expected = {
+        'baptismal_date': ['Date-1', 'Date-2', 'Date-3', 'Date-2', 'Date-3'],
+        'location_ecpp_baptism': ['Mission-1', 'Mission-2', 'Mission-3', 'Mission-2', 'Mission-3'],
+        'sex': ['Sex-1', 'Sex-2', 'Sex-3', 'Sex-2', 'Sex-3'],
+        'origin_parish_1790_census': ['Place-1', 'Place-2', 'Place-3', 'Place-2', 'Place-3'],
+        'notes_url_1790_census': ['Notes-1', 'Notes-2', NAN, 'Notes-2', NAN],
+        'matched_criteria': ['First Name', '', NAN, 'Age', 'Gender'],
+        'first_name': ['SpanishName-1', 'SpanishName-2', 'SpanishName-3', NAN, 'SpanishName-3'],
+        'last_name': ['Surname-1', '', 'Surname-3', NAN, 'Surname-3'],
+        'ethnicity': ['Ethnicity-1', NAN, '', NAN, 'Ethnicity-3'],
+        'father_first_name': ['FSpanishName-1', NAN, 'FSpanishName-3', NAN, 'FSpanishName-3'],
+        'father_last_name': ['FSurname-1', NAN, 'FSurname-3', NAN, 'FSurname-3'],
+        'father_military_status': ['FMilitaryStatus-1', NAN, NAN, NAN, 'FMilitaryStatus-3'],
+        'father_origin': ['FOrigin-1', NAN, NAN, NAN, 'FOrigin-3'],
+        'mother_first_name': ['MSpanishName-1', 'MSpanishName-2', NAN, NAN, 'MSpanishName-3'],
+        'mother_last_name': ['MSurname-1', 'MSurname-2', NAN, NAN, 'MSurname-3'],
+        'mother_origin': ['MOrigin-1', NAN, NAN, NAN, 'MOrigin-3'],
+        'race_1790': ['mulato', NAN, NAN, NAN, NAN],
+        'race_1781': [NAN, '', NAN, NAN, NAN],
+        'race_1785': [NAN, NAN, NAN, NAN, NAN],
+        'race_1821': [NAN, NAN, NAN, 'mulato', NAN],
+        'race_267': [NAN, NAN, NAN, NAN, '']
+    }
+
+    def test_inserted_values(self):
+        result = insert_matched_values(self.matches.copy(), self.datasets())
+        self.assertEqual(list(result.columns[:len(self.matches.columns)]), list(self.matches.columns))
+        for column, values in self.expected.items():
+            with self.subTest(column=column):
+                # '' must stay '' and missing values must stay NaN: the two are not interchangeable
+                self.assertEqual([None if pd.isna(item) else item for item in result[column]],
+                                 [None if pd.isna(item) else item for item in values])
+
+if __name__ == '__main__':
+    unittest.main()
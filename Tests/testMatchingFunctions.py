@@ -1,6 +1,16 @@
+import os
+import sys
 import unittest
 import numpy as np
-from matchingFunctions import modified_levenshtein_distance, convert_age
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nameMatching import convert_age, distance, normalize, phonetic_key
+
+
+def modified_levenshtein_distance(name1, name2):
+    return distance(normalize(name1), normalize(name2))
+
 
 class TestMatchingFunctions(unittest.TestCase):
 
@@ -76,5 +86,17 @@ class TestMatchingFunctions(unittest.TestCase):
     def test_special_cases(self):
         self.assertEqual(convert_age("inf"), float('inf'))
 
+    def test_phonetic_key(self):
+        self.assertEqual(phonetic_key("vicente"), phonetic_key("bisente"))
+        self.assertEqual(phonetic_key("llanos"), phonetic_key("yanos"))
+        self.assertEqual(phonetic_key("hernandez"), "ernandes")
+        self.assertIsNone(phonetic_key(None))
+
+    def test_coarse_phonetic_key(self):
+        self.assertEqual(phonetic_key("carrillo", coarse=True), phonetic_key("carillo", coarse=True))
+        self.assertEqual(phonetic_key("villa", coarse=True), phonetic_key("vila", coarse=True))
+        self.assertEqual(phonetic_key("o'campo", coarse=True), "osampo")
+        self.assertEqual(phonetic_key("", coarse=True), "")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nameMatching import NameIndex, colonial_costs, distance
+
+class TestNameIndex(unittest.TestCase):
+
+    names = ["jose maria", "joseph maria", "josef mario", "juan", "juana", "ivan", "llanos", "yanos", "ianos",
+             "hernandez", "ernandez", "fernandez", "gonzalez", "gonsales", "vicente", "bisente", "maria",
+             "mariana", "zuniga", "cuniga", "xavier", "javier", "ygnacio", "ignacio", "quintero", "cintero", "a", ""]
+
+    def test_matches_brute_force(self):
+        index = NameIndex(self.names)
+        for max_distance in range(4):
+            for query in self.names + ["josep", "hernandes", "yolanda"]:
+                expected = sorted(((name, distance(query, name, colonial_costs)) for name in self.names
+                                   if distance(query, name, colonial_costs) <= max_distance),
+                                  key=lambda match: (match[1], match[0]))
+                self.assertEqual(index.search(query, max_distance), expected, (query, max_distance))
+
+    def test_equivalences_are_candidates(self):
+        index = NameIndex(["llanos", "hernandez", "joseph", "vicente"])
+        self.assertIn("llanos", index.candidates("yanos", 0))
+        self.assertIn("hernandez", index.candidates("ernandez", 0))
+        self.assertIn("joseph", index.candidates("josej", 0))
+        self.assertIn("vicente", index.candidates("bizente", 0))
+
+    def test_items_and_discard(self):
+        index = NameIndex()
+        index.add("juan", 1)
+        index.add("juan", 2)
+        index.discard("juan", 1)
+        self.assertEqual(index.items["juan"], [2])
+        index.discard("juan", 2)
+        self.assertNotIn("juan", index)
+        self.assertEqual(index.search("juan", 1), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nameMatching import NormalizationCache, normalize
+
+class TestNormalizationCache(unittest.TestCase):
+
+    names = ["José", "Jose", "María de los Ángeles", "Juana  y  Peña", "ZÚÑIGA", "", None, np.nan, 12, "José"]
+
+    def test_matches_normalize(self):
+        for strip_particles in (False, True):
+            cache = NormalizationCache(strip_particles)
+            for name in self.names:
+                expected = normalize(name, strip_particles)
+                result = cache.normalize(name)
+                if isinstance(expected, float) and np.isnan(expected):
+                    self.assertTrue(np.isnan(result))
+                else:
+                    self.assertEqual(result, expected)
+
+    def test_results_are_interned(self):
+        cache = NormalizationCache()
+        self.assertIs(cache.normalize("José"), cache.normalize("Jose"))
+        self.assertIs(cache.normalize("".join(["Ma", "ría"])), cache.normalize("María"))
+
+    def test_counters(self):
+        cache = NormalizationCache()
+        for name in ["José", "José", "Jose", None]:
+            cache.normalize(name)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_normalize_many(self):
+        cache = NormalizationCache(strip_particles=True)
+        names = ["José del Río", "Ana", "José del Río", None]
+        self.assertEqual(cache.normalize_many(names), ["jose rio", "ana", "jose rio", None])
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual(cache.stats()['hits'], 1)
+        column = pd.Series(names, index=[3, 1, 4, 1])
+        self.assertEqual(cache.normalize_many(column).index.tolist(), [3, 1, 4, 1])
+
+    def test_maxsize(self):
+        cache = NormalizationCache(maxsize=2)
+        for name in ["Ana", "Eva", "Ines"]:
+            cache.normalize(name)
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertNotIn("Ana", cache.names)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import pickle
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'newPeopleMatchAlgo')))
+
+from peopleMatchAlgo import Node, Tree, match_nodes, pack_tree, unpack_tree
+from matchingFunctions import colonial_costs, distance
+
+class TestTreeIndex(unittest.TestCase):
+
+    first_names = ["jose", "josef", "juan", "juana", "maria", "marya", "ygnacio", "ignacio", "vicente", "bisente"]
+    surnames = ["lopez", "lopes", "llanos", "yanos", "hernandez", "ernandez", "garcia", "garsia"]
+
+    def records(self, count, seed=7):
+        generator = random.Random(seed)
+        return [{"name": f"{generator.choice(self.first_names)} {generator.choice(self.surnames)}",
+                 "gender": generator.choice(["male", "female", None]),
+                 "age": str(generator.choice([generator.randint(0, 70), ""])),
+                 "race": generator.choice(["indio", "mulato", None])}
+                for _ in range(count)]
+
+    @staticmethod
+    def brute_force_tree(records):
+        """Tree.add_node as a full scan over the nodes."""
+        nodes = set()
+        for record in records:
+            new_node = Node(record, "padron_1781")
+            for node in nodes:
+                if match_nodes(node, new_node):
+                    node.merge(new_node.info)
+                    for year, data in new_node.timeline.items():
+                        if year not in node.timeline:
+                            node.timeline[year] = data
+                    break
+            else:
+                nodes.add(new_node)
+        return nodes
+
+    @staticmethod
+    def signature(nodes):
+        return sorted((node.name, repr(sorted((key, str(value)) for key, value in node.info.items())))
+                      for node in nodes)
+
+    def test_same_merges_as_full_scan(self):
+        records = self.records(300)
+        tree = Tree()
+        for record in records:
+            tree.add_node(Node(record, "padron_1781"))
+        self.assertEqual(self.signature(tree.nodes), self.signature(self.brute_force_tree(records)))
+        self.assertEqual(len(tree.index), len(tree.nodes))
+
+    def test_candidates_cover_every_match(self):
+        tree = Tree()
+        for record in self.records(200, seed=3):
+            tree.add_node(Node(record, "padron_1781"))
+        for record in self.records(100, seed=11):
+            new_node = Node(record, "padron_1785")
+            expected = {node.name for node in tree.nodes if match_nodes(node, new_node)}
+            candidates = {node.name for node in tree.index.candidates(new_node, 2)}
+            self.assertTrue(expected <= candidates, new_node.name)
+
+    def test_find_or_create_node(self):
+        tree = Tree()
+        for record in self.records(200, seed=5):
+            tree.add_node(Node(record, "padron_1781"))
+        for name in ["José Lopez", "Juan Yanos", "Maria Garsía", "Bicente Ernandes", "Pedro Alvarado"]:
+            normalized = Node({"name": name}).name
+            exact = [node for node in tree.nodes if node.name == normalized]
+            fuzzy = [node for node in tree.nodes if distance(node.name, normalized, colonial_costs) <= 2]
+            expected = (exact or fuzzy or [None])[0]
+            size = len(tree.nodes)
+            node = tree.find_or_create_node(name)
+            if expected is None:
+                self.assertEqual((node.name, len(tree.nodes)), (normalized, size + 1))
+                self.assertIs(tree.index.get(normalized), node)
+            else:
+                self.assertIs(node, expected)
+
+    def test_refresh_after_merge(self):
+        tree = Tree()
+        tree.add_node(Node({"name": "juan lopez", "gender": "male"}, "padron_1781"))
+        tree.add_node(Node({"name": "juan lopes", "gender": "male", "age": "30"}, "padron_1781"))
+        node = tree.index.get("juan lopez")
+        self.assertEqual(tree.index.keys[node.name], ("male", 1751 // 5))
+
+    def test_pack_round_trip(self):
+        tree = Tree()
+        for record in self.records(200, seed=9):
+            tree.add_node(Node(record, "padron_1781"))
+        nodes = list(tree.nodes)
+        nodes[0].father, nodes[0].mother, nodes[0].spouse = nodes[1], "Unknown Mother", None
+        nodes[1].children.add(nodes[0])
+        restored = unpack_tree(pickle.loads(pickle.dumps(pack_tree(tree))))
+        self.assertEqual([node.name for node in restored.nodes], [node.name for node in tree.nodes])
+        self.assertEqual(self.signature(restored.nodes), self.signature(tree.nodes))
+        self.assertEqual(restored.index.keys, tree.index.keys)
+        copy = restored.index.get(nodes[0].name)
+        self.assertIs(copy.father, restored.index.get(nodes[1].name))
+        self.assertEqual((copy.mother, copy.spouse), ("Unknown Mother", None))
+        self.assertEqual(copy.father.children, {copy})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Compare matchVersion1's combine_parental_matches with the groupby.apply version it replaced.
+
+Runs both on the people_collect_2 outputs in matchVersion1/data_output, and on copies
+replicated with shifted #IDs for timing, and checks that the CSV output is identical.
+
+Usage:
+    python benchmarks/benchmark_combine_parental_matches.py --replicate 1 10 100
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_OUTPUT = os.path.join(REPO_ROOT, 'matchVersion1', 'data_output')
+sys.path.insert(0, os.path.join(REPO_ROOT, 'matchVersion1'))
+
+from match_persons_script import combine_parental_matches
+
+
+def combine_parental_matches_groupby(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous per-group implementation, kept as the reference for output and timing."""
+
+    def combine_rows(group):
+        direct_match = group[group['match_type'] == 'Direct']
+        if not direct_match.empty:
+            combined_row = direct_match.iloc[0].copy()
+        else:
+            combined_row = group.iloc[0].copy()
+
+        if len(group) > 1:
+            for col in ['Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score']:
+                combined_row[col] = group[col].max()
+
+            for col in group.columns:
+                if col not in ['Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score', 'match_type', '#ID', 'ecpp_id']:
+                    direct_value = direct_match[col].values[0] if not direct_match.empty else None
+                    mother_value = group[group['match_type'] == 'mother'][col].values[0] if not group[group['match_type'] == 'mother'].empty else None
+                    father_value = group[group['match_type'] == 'father'][col].values[0] if not group[group['match_type'] == 'father'].empty else None
+
+                    combined_row[col] = direct_value or mother_value or father_value
+
+            combined_row['match_type'] = 'mother_father'
+        return combined_row
+
+    # Selecting the columns explicitly keeps #ID and ecpp_id in each group on every pandas version.
+    return df.groupby(['#ID', 'ecpp_id'])[list(df.columns)].apply(combine_rows).reset_index(drop=True)
+
+
+def replicate(df: pd.DataFrame, times: int) -> pd.DataFrame:
+    """Stack times copies of df, shifting #ID so that copies form separate groups."""
+    offset = int(df['#ID'].max()) + 1
+    return pd.concat([df.assign(**{'#ID': df['#ID'] + copy * offset}) for copy in range(times)], ignore_index=True)
+
+
+def time_call(function, df):
+    start_time = time.perf_counter()
+    result = function(df.copy())
+    return result, time.perf_counter() - start_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', nargs='+', default=['people_collect_2.csv', 'low_people_collect_2.csv'])
+    parser.add_argument('--replicate', nargs='+', type=int, default=[1, 10])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(logging.WARNING)
+    for file_name in args.files:
+        data = pd.read_csv(os.path.join(DATA_OUTPUT, file_name))
+        for times in args.replicate:
+            df = replicate(data, times)
+            expected, groupby_seconds = time_call(combine_parental_matches_groupby, df)
+            result, vectorized_seconds = time_call(combine_parental_matches, df)
+            identical = expected.to_csv(index=False) == result.to_csv(index=False)
+            print(f"{file_name} x{times}: {len(df)} rows -> {len(result)}, groupby {groupby_seconds:.3f}s, "
+                  f"vectorized {vectorized_seconds:.3f}s ({groupby_seconds / vectorized_seconds:.0f}x), "
+                  f"identical output: {identical}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""
+Scaling benchmark for the person-matching pipelines.
+
+Generates synthetic census and baptism records shaped like data/padron_*.tsv and
+data/1790 Census Data Complete.tsv, runs matchVersion0, matchVersion1 and
+newPeopleMatchAlgo on them at several scale factors, and appends per-stage wall
+time, CPU time and peak RSS to a CSV history file. Each (pipeline, scale) run is
+a separate process so peak RSS is not inherited from earlier runs.
+
+Usage:
+    python benchmarks/benchmark_matching.py --scales 1 10 100 --pipelines matchVersion1
+"""
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.path.join(REPO_ROOT, 'data')
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_history.csv')
+
+PIPELINES = ['matchVersion0', 'matchVersion1', 'newPeopleMatchAlgo']
+
+# Records per dataset at scale 1.
+BASE_CENSUS_SIZE = 40
+BASE_BAPTISMS_SIZE = 100
+
+HISTORY_FIELDS = ['timestamp', 'commit', 'pipeline', 'scale', 'stage', 'status', 'rows',
+                  'wall_seconds', 'cpu_seconds', 'peak_rss_mb']
+
+# Spelling variants that the custom_costs tables treat as (near) equivalent.
+SPELLING_VARIANTS = [('v', 'b'), ('b', 'v'), ('s', 'z'), ('z', 's'), ('c', 's'), ('y', 'i'),
+                     ('i', 'y'), ('j', 'g'), ('g', 'j'), ('ll', 'y'), ('h', '')]
+
+
+def read_name_pools():
+    """Collect first names, surnames and races from the bundled TSV files."""
+    first_names, last_names, races = set(), set(), set()
+    for file_name in ['padron_1767.tsv', 'padron_1781.tsv', 'padron_1785.tsv', 'padron_1821.tsv']:
+        frame = pd.read_csv(os.path.join(DATA_DIR, file_name), sep='\t', dtype=str)
+        frame.columns = [column.strip() for column in frame.columns]
+        first_names.update(frame['Ego_First Name'].dropna().str.strip())
+        last_names.update(frame['Ego_Paternal Last Name'].dropna().str.strip())
+        races.update(frame.filter(like='Race').iloc[:, 0].dropna().str.strip())
+    census = pd.read_csv(os.path.join(DATA_DIR, '1790 Census Data Complete.tsv'), sep='\t', dtype=str)
+    first_names.update(census['First'].dropna().str.strip())
+    last_names.update(census['Last'].dropna().str.strip())
+    races.update(census['Race'].dropna().str.strip())
+    return sorted(name for name in first_names if name), sorted(name for name in last_names if name), sorted(races)
+
+
+class SyntheticRecords:
+    """Deterministic synthetic records drawn from the real name pools with colonial spelling noise."""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.first_names, self.last_names, self.races = read_name_pools()
+        # matchVersion1 only keeps Afro-descendant census rows, so make sure those races occur.
+        self.races += ['mulato', 'mulata', 'pardo', 'moreno', 'negro']
+
+    def vary(self, name):
+        if not name or self.random.random() > 0.3:
+            return name
+        source, target = self.random.choice(SPELLING_VARIANTS)
+        return name.replace(source, target, 1)
+
+    def first(self):
+        return self.vary(self.random.choice(self.first_names))
+
+    def last(self):
+        return self.vary(self.random.choice(self.last_names))
+
+    def maybe(self, value, probability=0.7):
+        return value if self.random.random() < probability else None
+
+    def sex(self):
+        return self.random.choice(['M', 'F'])
+
+    def age(self):
+        return str(self.random.randint(0, 70))
+
+    def padron(self, size):
+        """Rows shaped like data/padron_*.tsv."""
+        rows = []
+        for _ in range(size):
+            rows.append({
+                'Ego_First Name': self.first(), 'Ego_Paternal Last Name': self.last(),
+                'Ego_Maternal Last Name': self.maybe(self.last(), 0.3), 'Race': self.random.choice(self.races),
+                'Sex': self.sex(), 'Age': self.age(),
+                'Father_First Name': self.maybe(self.first(), 0.3), 'Father_Paternal Last Name': self.maybe(self.last(), 0.3),
+                'Mother_First Name': self.maybe(self.first(), 0.3), 'Mother_Paternal Last Name': self.maybe(self.last(), 0.3),
+                'Husband_First Name': self.maybe(self.first(), 0.2), 'Huband_Paternal Last name': self.maybe(self.last(), 0.2),
+                'Wife_First Name': self.maybe(self.first(), 0.2), 'Wife_ Paternal Last Name': self.maybe(self.last(), 0.2),
+                'Status': None
+            })
+        return pd.DataFrame(rows)
+
+    def census_1790(self, size):
+        """Rows shaped like data/1790 Census Data Complete.tsv."""
+        rows = []
+        for _ in range(size):
+            row = {
+                'Current_Location': self.random.choice(['San Diego', 'Santa Barbara', 'Monterey', 'San Jose']),
+                'First': self.first(), 'Last': self.last(), 'Race': self.random.choice(self.races),
+                'Gender': self.random.choice(['m', 'f']), 'Age': self.age(),
+                'Spouse_First': self.maybe(self.first(), 0.4), 'Spouse_Last': self.maybe(self.last(), 0.4),
+                'Father_First': self.maybe(self.first(), 0.2), 'Father_Last': self.maybe(self.last(), 0.2),
+                'Mother_First': self.maybe(self.first(), 0.2), 'Mother_Last': self.maybe(self.last(), 0.2),
+                'Origin Parish': None, 'Notes/URL': None
+            }
+            for child in range(1, 15):
+                row[f'Child{child}'] = self.maybe(self.first(), 0.1) if child <= 4 else None
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def baptisms(self, size):
+        """Rows shaped like the ECPP Baptisms.csv columns used by matchVersion0/1."""
+        rows = []
+        for _ in range(size):
+            rows.append({
+                'SpanishName': self.first(), 'Surname': self.last(),
+                'MSpanishName': self.maybe(self.first(), 0.8), 'MSurname': self.maybe(self.last(), 0.8),
+                'FSpanishName': self.maybe(self.first(), 0.8), 'FSurname': self.maybe(self.last(), 0.8),
+                'Sex': self.sex(), 'Age': self.maybe(self.age(), 0.3),
+                'Date': f"{self.random.randint(1, 28)} Jan {self.random.randint(1770, 1830)}",
+                'Mission': self.random.choice(['SD', 'SG', 'SB', 'SC']), 'Place': None, 'Notes': None,
+                'Ethnicity': self.random.choice(['Razon', 'Indio', 'Unstated']), 'MEthnicity': None, 'FEthnicity': None,
+                'FMilitaryStatus': None, 'FOrigin': None, 'MOrigin': None
+            })
+        return pd.DataFrame(rows)
+
+
+def result_rows(result):
+    """Number of rows, pairs or tree nodes a stage produced."""
+    if hasattr(result, 'nodes'):
+        return len(result.nodes)
+    return len(result) if hasattr(result, '__len__') else ''
+
+
+class StageTimer:
+    """Records wall time, CPU time and peak RSS of each benchmark stage."""
+
+    def __init__(self):
+        self.results = []
+
+    def run(self, stage, function, *args):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = function(*args)
+        self.results.append({
+            'stage': stage, 'status': 'ok',
+            'rows': result_rows(result),
+            'wall_seconds': round(time.perf_counter() - wall_start, 4),
+            'cpu_seconds': round(time.process_time() - cpu_start, 4),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        })
+        return result
+
+
+def benchmark_match_version1(scale, records, timer, max_pairs, blocking):
+    sys.path.insert(0, os.path.join(REPO_ROOT, 'matchVersion1'))
+    from blocking import DEFAULT_BLOCKING_RULES
+    from data_processing import add_identifiers, clean_names_padrones, get_config
+    from match_person_parallel_functions import select_top_candidates
+    from match_persons_script import combine_parental_matches, filter_matched_persons, insert_matched_values
+    from person_matcher import PersonMatcher
+
+    config = get_config(DEFAULT_BLOCKING_RULES if blocking else None)
+    datasets = {'afro_1790_census': records.census_1790(BASE_CENSUS_SIZE * scale)}
+    for key in ['padron_1781', 'padron_1785', 'padron_1821', 'padron_267']:
+        datasets[key] = records.padron(BASE_CENSUS_SIZE * scale)
+    datasets['baptisms'] = records.baptisms(BASE_BAPTISMS_SIZE * scale)
+    for key, dataset in datasets.items():
+        add_identifiers(dataset, '#ID' if key == 'baptisms' else 'ecpp_id')
+        if 'padron' in key:
+            clean_names_padrones(dataset)
+
+    matched_persons_key = []
+    for dataset_key in ['afro_1790_census', 'padron_1785']:
+        if not blocking and len(datasets[dataset_key]) * len(datasets['baptisms']) > max_pairs:
+            return 'skipped: pair limit'
+        current_config = config['padrones_config'] if 'padron' in dataset_key else config['census_config']
+        matcher = PersonMatcher(datasets[dataset_key], datasets['baptisms'], current_config)
+        timer.run(f'{dataset_key}:create_matched_records', matcher.create_matched_records)
+        timer.run(f'{dataset_key}:name_scoring', lambda: (matcher.direct_match_names(), matcher.match_parents_names(),
+                                                          matcher.matched_records)[-1])
+        timer.run(f'{dataset_key}:other_scoring', lambda: (matcher.match_other_features(),
+                                                           [matcher.calculate_total_match_score(column) for column in
+                                                            ['Direct_Total_Match_Score', 'Mother_Total_Match_Score',
+                                                             'Father_Total_Match_Score']],
+                                                           matcher.list_matched_criteria(),
+                                                           matcher.matched_records)[-1])
+        candidates = timer.run(f'{dataset_key}:filtering', lambda: filter_matched_persons(
+            select_top_candidates(matcher.matched_records, current_config, 3), dataset_key, 3))
+        matched_persons_key.append(candidates)
+
+    combined = timer.run('combine_parental_matches', combine_parental_matches,
+                         pd.concat(matched_persons_key, ignore_index=True))
+    timer.run('insert_matched_values', insert_matched_values, combined, datasets)
+    return 'ok'
+
+
+def benchmark_match_version0(scale, records, timer, max_pairs, blocking):
+    sys.path.insert(0, os.path.join(REPO_ROOT, 'matchVersion0'))
+    from person_matcher_v0 import PersonMatcher
+    from person_matching_functions_v0 import filter_records_by_score
+
+    config = {
+        'ecpp_id_col': 'ecpp_id', 'records_id_col': '#ID',
+        'census': {'First Name': 'First', 'Last Name': 'Last', 'Gender': 'Gender'},
+        'baptisms': {'First Name': 'SpanishName', 'Last Name': 'Surname', 'Mother First Name': 'MSpanishName',
+                     'Mother Last Name': 'MSurname', 'Father First Name': 'FSpanishName',
+                     'Father Last Name': 'FSurname', 'Gender': 'Sex'}
+    }
+    census = records.census_1790(BASE_CENSUS_SIZE * scale)
+    baptisms = records.baptisms(BASE_BAPTISMS_SIZE * scale)
+    census['ecpp_id'] = range(1, len(census) + 1)
+    baptisms['#ID'] = range(1, len(baptisms) + 1)
+    if len(census) * len(baptisms) > max_pairs:
+        return 'skipped: pair limit'
+
+    matcher = PersonMatcher(census, baptisms, config)
+    timer.run('create_matched_records', matcher.create_matched_records)
+    timer.run('name_scoring', lambda: (matcher.direct_match_names(), matcher.match_parents_names(),
+                                       matcher.matched_records)[-1])
+    timer.run('other_scoring', lambda: (matcher.match_other_features(), matcher.calculate_direct_total_match_score(),
+                                        matcher.calculate_mother_total_match_score(),
+                                        matcher.calculate_father_total_match_score(), matcher.matched_records)[-1])
+    timer.run('filtering', filter_records_by_score, matcher.matched_records, 'Direct_Total_Match_Score', 0.5)
+    return 'ok'
+
+
+def benchmark_new_people_match_algo(scale, records, timer, max_pairs, blocking):
+    sys.path.insert(0, os.path.join(REPO_ROOT, 'newPeopleMatchAlgo'))
+    logging.disable(logging.WARNING)
+    from mappings import mappings
+    from personReader import standardize_column_names, transform_data
+    import peopleMatchAlgo
+
+    raw = {'padron_1781': records.padron(BASE_CENSUS_SIZE * scale),
+           'padron_1785': records.padron(BASE_CENSUS_SIZE * scale),
+           '1790_census': records.census_1790(BASE_CENSUS_SIZE * scale)}
+    trees_by_census = {}
+    for dataset_name, frame in raw.items():
+        rows = standardize_column_names(frame.fillna('').astype(str).to_dict('records'))
+        transformed = transform_data(rows, mappings[dataset_name])
+        trees_by_census[dataset_name] = timer.run(f'{dataset_name}:build_census_tree',
+                                                  peopleMatchAlgo.build_census_tree, dataset_name, transformed)
+
+    timer.run('integrate_trees', peopleMatchAlgo.integrate_trees, trees_by_census)
+    return 'ok'
+
+
+BENCHMARKS = {
+    'matchVersion0': benchmark_match_version0,
+    'matchVersion1': benchmark_match_version1,
+    'newPeopleMatchAlgo': benchmark_new_people_match_algo
+}
+
+
+def run_benchmark(pipeline, scale, max_pairs, blocking, seed, queue):
+    """Child process entry point: run one pipeline at one scale and send the stage results back."""
+    timer = StageTimer()
+    try:
+        status = BENCHMARKS[pipeline](scale, SyntheticRecords(seed), timer, max_pairs, blocking)
+    except Exception as e:
+        status = f'error: {e}'
+    queue.put((status, timer.results))
+
+
+def run_isolated(pipeline, scale, max_pairs, blocking, seed, timeout):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_benchmark, args=(pipeline, scale, max_pairs, blocking, seed, queue))
+    process.start()
+    try:
+        status, results = queue.get(timeout=timeout)
+    except Exception:
+        process.terminate()
+        status, results = f'timeout after {timeout}s', []
+    process.join()
+    if status != 'ok' or not results:
+        results.append({'stage': 'total', 'status': status, 'rows': '', 'wall_seconds': '', 'cpu_seconds': '',
+                        'peak_rss_mb': ''})
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def read_history(history_file):
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file, newline='') as file:
+        return list(csv.DictReader(file))
+
+
+def append_history(history_file, rows):
+    write_header = not os.path.exists(history_file)
+    with open(history_file, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=HISTORY_FIELDS)
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def report_regressions(history, rows, threshold):
+    """Compare each stage with its most recent earlier run and log slowdowns above threshold."""
+    previous = {}
+    for row in history:
+        if row['status'] == 'ok':
+            previous[(row['pipeline'], row['scale'], row['stage'])] = row
+    for row in rows:
+        earlier = previous.get((row['pipeline'], str(row['scale']), row['stage']))
+        if row['status'] != 'ok' or earlier is None or not float(earlier['wall_seconds']):
+            continue
+        ratio = row['wall_seconds'] / float(earlier['wall_seconds'])
+        message = (f"{row['pipeline']} x{row['scale']} {row['stage']}: {row['wall_seconds']:.3f}s "
+                   f"vs {float(earlier['wall_seconds']):.3f}s at {earlier['commit'] or earlier['timestamp']} ({ratio:.2f}x)")
+        if ratio > 1 + threshold:
+            logging.warning(f"Regression: {message}")
+        else:
+            logging.info(message)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=PIPELINES)
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10, 100])
+    parser.add_argument('--max-pairs', type=int, default=20_000_000,
+                        help='skip full-product runs with more census x baptism pairs than this')
+    parser.add_argument('--blocking', action='store_true', help='run matchVersion1 with its default blocking rules')
+    parser.add_argument('--timeout', type=int, default=3600, help='seconds allowed per pipeline and scale')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', default=HISTORY_FILE)
+    parser.add_argument('--regression-threshold', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    history = read_history(args.history)
+    timestamp = datetime.now().isoformat(timespec='seconds')
+    commit = current_commit()
+
+    rows = []
+    for pipeline in args.pipelines:
+        for scale in args.scales:
+            logging.info(f"Benchmarking {pipeline} at {scale}x")
+            for result in run_isolated(pipeline, scale, args.max_pairs, args.blocking, args.seed, args.timeout):
+                row = dict(result, timestamp=timestamp, commit=commit, pipeline=pipeline, scale=scale)
+                logging.info(f"{pipeline} x{scale} {row['stage']}: {row['status']} {row['wall_seconds']}s "
+                             f"cpu {row['cpu_seconds']}s peak RSS {row['peak_rss_mb']} MB rows {row['rows']}")
+                rows.append(row)
+
+    append_history(args.history, rows)
+    report_regressions(history, rows, args.regression_threshold)
+    logging.info(f"Appended {len(rows)} results to {args.history}")
+
+
+if __name__ == '__main__':
+    main()
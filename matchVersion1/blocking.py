@@ -0,0 +1,196 @@
+import logging
+import numpy as np
+import pandas as pd
+from person_matching_functions import normalize_spanish_names, phonetic_key
+
+NAME_PARTICLES = {'de', 'del', 'la', 'las', 'los', 'y'}
+
+# Census role -> baptism role compared in each PersonMatcher scoring pass.
+MATCH_PASSES = {
+    'direct': {'First Name': 'First Name', 'Last Name': 'Last Name', 'Gender': 'Gender'},
+    'mother': {'First Name': 'Mother First Name', 'Last Name': 'Mother Last Name'},
+    'father': {'First Name': 'Father First Name', 'Last Name': 'Father Last Name'}
+}
+
+
+def first_name_token(name):
+    """Returns the first normalized token of a name that is not a particle such as 'de' or 'y'."""
+    if pd.isna(name):
+        return ''
+    tokens = normalize_spanish_names(str(name)).replace(',', ' ').split()
+    for token in tokens:
+        if token not in NAME_PARTICLES:
+            return token
+    return ''
+
+
+def surname_phonetic_key(names: pd.Series) -> pd.Series:
+    """Coarse phonetic key of the first significant surname token, truncated to four characters."""
+    def key(name):
+        return phonetic_key(first_name_token(name), coarse=True)[:4] or None
+    return _map_unique(names, key)
+
+
+def first_initial_length_key(names: pd.Series) -> pd.Series:
+    """Phonetic first letter of the first name plus a coarse length bucket."""
+    def key(name):
+        token = first_name_token(name)
+        code = phonetic_key(token, coarse=True)
+        return f"{code[0]}{len(token) // 3}" if code else None
+    return _map_unique(names, key)
+
+
+def sex_key(values: pd.Series) -> pd.Series:
+    """Lowercased sex, compared the same way as PersonMatcher.match_gender_score."""
+    def key(value):
+        return None if pd.isna(value) else str(value).strip().lower() or None
+    return _map_unique(values, key)
+
+
+# Blocking key name -> (config role the key is computed from, key function).
+BLOCKING_KEYS = {
+    'surname_phonetic': ('Last Name', surname_phonetic_key),
+    'first_initial_length': ('First Name', first_initial_length_key),
+    'sex': ('Gender', sex_key)
+}
+
+DEFAULT_BLOCKING_RULES = [('surname_phonetic',), ('first_initial_length', 'sex')]
+
+
+def _map_unique(values: pd.Series, key_function) -> pd.Series:
+    """Applies key_function once per distinct value instead of once per row."""
+    codes, uniques = pd.factorize(values)
+    keys = pd.Series([key_function(value) for value in uniques], dtype=object)
+    return pd.Series(keys.reindex(codes).to_numpy(), index=values.index, dtype=object)
+
+
+class Blocker:
+    """
+    Generates candidate (census, baptism) pairs for PersonMatcher.
+
+    A rule is a tuple of BLOCKING_KEYS names. Two records form a candidate pair when
+    they agree on every key of at least one rule in at least one of the MATCH_PASSES.
+    Keys whose role has no baptism column in a pass (e.g. 'sex' for the parents) are
+    dropped from the rule for that pass, and rules left empty are skipped.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = [tuple(rule) for rule in (rules or DEFAULT_BLOCKING_RULES)]
+        for rule in self.rules:
+            for key_name in rule:
+                if key_name not in BLOCKING_KEYS:
+                    raise ValueError(f"Unknown blocking key: {key_name}")
+
+    def candidate_positions(self, census: pd.DataFrame, baptisms: pd.DataFrame, config: dict) -> pd.DataFrame:
+        """Returns the sorted, de-duplicated candidate pairs as row positions into census and baptisms."""
+        pairs = [self._rule_positions(census, baptisms, config, rule, roles)
+                 for rule in self.rules for roles in MATCH_PASSES.values()]
+        pairs = [pair for pair in pairs if pair is not None]
+        if not pairs:
+            return pd.DataFrame({'census_pos': pd.Series(dtype='int64'), 'baptism_pos': pd.Series(dtype='int64')})
+        return (pd.concat(pairs, ignore_index=True)
+                .drop_duplicates()
+                .sort_values(['census_pos', 'baptism_pos'])
+                .reset_index(drop=True))
+
+    def candidate_pairs(self, census: pd.DataFrame, baptisms: pd.DataFrame, config: dict) -> pd.DataFrame:
+        """Returns candidate pairs as an id frame shaped like the full product in create_matched_records."""
+        positions = self.candidate_positions(census, baptisms, config)
+        ecpp_ids = census[config['ecpp_id_col']].to_numpy()
+        records_ids = baptisms[config['records_id_col']].to_numpy()
+        return pd.DataFrame({
+            config['ecpp_id_col']: ecpp_ids[positions['census_pos'].to_numpy()],
+            config['records_id_col']: records_ids[positions['baptism_pos'].to_numpy()]
+        })
+
+    def estimated_candidate_counts(self, census: pd.DataFrame, baptisms: pd.DataFrame, config: dict) -> np.ndarray:
+        """
+        Estimates the candidate count of every census row without building the pairs.
+
+        A row's estimate is the size of the baptism block it falls in, summed over the rules and
+        passes and capped at the number of baptisms. Pairs shared by several rules or passes
+        count more than once, so the estimate is an upper bound of candidate_positions.
+        """
+        counts = np.zeros(len(census), dtype=np.int64)
+        for rule in self.rules:
+            for roles in MATCH_PASSES.values():
+                keys = self._rule_keys(census, baptisms, config, rule, roles)
+                if keys is None:
+                    continue
+                key_names, census_keys, baptism_keys = keys
+                block_sizes = baptism_keys.groupby(key_names).size().rename('block_size').reset_index()
+                sizes = census_keys.merge(block_sizes, on=key_names, how='left')['block_size']
+                counts[census_keys['census_pos'].to_numpy()] += sizes.fillna(0).to_numpy(dtype=np.int64)
+        return np.minimum(counts, len(baptisms))
+
+    def _rule_keys(self, census, baptisms, config, rule, roles):
+        """The key names of rule in a pass and the census and baptism key frames, rows missing a key dropped."""
+        key_names = [key_name for key_name in rule
+                     if BLOCKING_KEYS[key_name][0] in roles
+                     and roles[BLOCKING_KEYS[key_name][0]] in config['baptisms']]
+        if not key_names:
+            return None
+
+        census_keys = pd.DataFrame({'census_pos': range(len(census))})
+        baptism_keys = pd.DataFrame({'baptism_pos': range(len(baptisms))})
+        for key_name in key_names:
+            role, key_function = BLOCKING_KEYS[key_name]
+            census_column = census[config['census'][role]].reset_index(drop=True)
+            baptism_column = baptisms[config['baptisms'][roles[role]]].reset_index(drop=True)
+            census_keys[key_name] = key_function(census_column)
+            baptism_keys[key_name] = key_function(baptism_column)
+
+        return key_names, census_keys.dropna(), baptism_keys.dropna()
+
+    def _rule_positions(self, census, baptisms, config, rule, roles):
+        keys = self._rule_keys(census, baptisms, config, rule, roles)
+        if keys is None:
+            return None
+        key_names, census_keys, baptism_keys = keys
+        return census_keys.merge(baptism_keys, on=key_names)[['census_pos', 'baptism_pos']]
+
+
+def blocking_recall_report(full_matches: pd.DataFrame, census: pd.DataFrame, baptisms: pd.DataFrame,
+                           config: dict, rules=None, threshold: int = 3) -> pd.DataFrame:
+    """
+    Measures how many true matches each blocking key and rule loses against the full product.
+
+    Args:
+        full_matches (pd.DataFrame): PersonMatcher output scored on the full product.
+        census (pd.DataFrame): The census records that were matched.
+        baptisms (pd.DataFrame): The baptism records that were matched.
+        config (dict): The matching configuration used for full_matches.
+        rules (list): Blocking rules to evaluate, defaults to DEFAULT_BLOCKING_RULES.
+        threshold (int): Total match score at which a pair counts as a true match.
+
+    Returns:
+        pd.DataFrame: One row per single key, per rule and for all rules combined.
+    """
+    rules = [tuple(rule) for rule in (rules or DEFAULT_BLOCKING_RULES)]
+    id_columns = [config['ecpp_id_col'], config['records_id_col']]
+    score_columns = ['Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score']
+
+    true_mask = (full_matches[score_columns] >= threshold).any(axis=1)
+    true_pairs = pd.MultiIndex.from_frame(full_matches.loc[true_mask, id_columns])
+    full_pair_count = len(census) * len(baptisms)
+
+    evaluated = [(key_name, [(key_name,)]) for key_name in sorted({key for rule in rules for key in rule})]
+    evaluated += [(' & '.join(rule), [rule]) for rule in rules if len(rule) > 1]
+    evaluated.append(('all rules', rules))
+
+    report = []
+    for label, label_rules in evaluated:
+        candidates = pd.MultiIndex.from_frame(Blocker(label_rules).candidate_pairs(census, baptisms, config))
+        kept = int(true_pairs.isin(candidates).sum())
+        report.append({
+            'blocking': label,
+            'candidate_pairs': len(candidates),
+            'pair_reduction': 1 - len(candidates) / full_pair_count if full_pair_count else 0.0,
+            'true_matches': len(true_pairs),
+            'true_matches_lost': len(true_pairs) - kept,
+            'recall': kept / len(true_pairs) if len(true_pairs) else 1.0
+        })
+        logging.info(f"Blocking '{label}': {len(candidates)} candidate pairs, "
+                     f"lost {len(true_pairs) - kept} of {len(true_pairs)} true matches")
+
+    return pd.DataFrame(report)
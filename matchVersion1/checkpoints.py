@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+
+# Bump whenever a change to the matching code changes its results, so that checkpoints and
+# incremental state written by the older code are no longer reused.
+MATCHING_VERSION = 1
+
+
+def frame_hash(frame: pd.DataFrame) -> str:
+    """Content hash of a DataFrame: its columns, dtypes, index and values."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([list(map(str, frame.columns)), list(map(str, frame.dtypes))]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def value_hash(value) -> str:
+    """Content hash of a JSON-serializable value such as a matching config."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def inputs_hash(inputs) -> str:
+    """Hash of the inputs a stored result was computed from, salted with MATCHING_VERSION."""
+    return value_hash([MATCHING_VERSION, inputs])
+
+
+class CheckpointStore:
+    """
+    Pickled matching results in a local directory, keyed by the content hash of their inputs.
+
+    A result is only reused when the census rows, the baptisms, the matching config, the run
+    mode and the MATCHING_VERSION it was computed with are all unchanged, so stale checkpoints
+    are never read; they are simply no longer looked up.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def scope(self, dataset_key: str, *inputs) -> 'CheckpointScope':
+        """Checkpoints of one dataset for the given baptisms hash, config and mode."""
+        return CheckpointScope(self, dataset_key, inputs_hash(inputs))
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name + '.pkl')
+
+    def load(self, name: str):
+        path = self.path(name)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_pickle(path)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+            return None
+
+    def save(self, name: str, frame: pd.DataFrame):
+        """Write the checkpoint atomically, so an interrupted run never leaves a partial file behind."""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.to_pickle(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+
+class CheckpointScope:
+    """Dataset and chunk checkpoints of one dataset_key under one set of inputs."""
+
+    def __init__(self, store: CheckpointStore, dataset_key: str, inputs_hash: str):
+        self.store = store
+        self.dataset_key = dataset_key
+        self.inputs_hash = inputs_hash[:16]
+
+    def name(self, census: pd.DataFrame, kind: str) -> str:
+        return os.path.join(self.dataset_key, f"{kind}-{self.inputs_hash}-{frame_hash(census)[:16]}")
+
+    def load_dataset(self, census: pd.DataFrame):
+        """The finished result for the whole census dataset, or None."""
+        result = self.store.load(self.name(census, 'dataset'))
+        if result is not None:
+            logging.info(f"Reusing checkpointed results for {self.dataset_key}")
+        return result
+
+    def save_dataset(self, census: pd.DataFrame, result: pd.DataFrame):
+        self.store.save(self.name(census, 'dataset'), result)
+
+    def load_chunk(self, census_chunk: pd.DataFrame):
+        """The result of one census chunk, or None."""
+        return self.store.load(self.name(census_chunk, 'chunk'))
+
+    def save_chunk(self, census_chunk: pd.DataFrame, result: pd.DataFrame):
+        self.store.save(self.name(census_chunk, 'chunk'), result)
@@ -12,12 +12,17 @@ def clean_names_padrones(df):
                            df['Ego_Maternal Last Name'].fillna('')).str.strip()
 
 
-def get_config():
-    """Matching configuration structure for score matching."""
+def get_config(blocking_rules=None):
+    """Matching configuration structure for score matching.
+
+    blocking_rules (e.g. blocking.DEFAULT_BLOCKING_RULES) restricts scoring to blocked
+    candidate pairs; None keeps the full census x baptisms product.
+    """
     return {
         'census_config': {
             'ecpp_id_col': 'ecpp_id',
             'records_id_col': '#ID',
+            'blocking_rules': blocking_rules,
             'census': {'First Name': 'First', 'Last Name': 'Last', 'Gender': 'Gender', 'Age': 'Age'},
             'baptisms': {'First Name': 'SpanishName', 'Last Name': 'Surname', 'Mother First Name': 'MSpanishName',
                          'Mother Last Name': 'MSurname', 'Father First Name': 'FSpanishName',
@@ -26,6 +31,7 @@ def get_config():
         'padrones_config': {
             'ecpp_id_col': 'ecpp_id',
             'records_id_col': '#ID',
+            'blocking_rules': blocking_rules,
             'census': {'First Name': 'Ego_First Name', 'Last Name': 'Ego_Last Name', 'Gender': 'Sex', 'Age': 'Age'},
             'baptisms': {'First Name': 'SpanishName', 'Last Name': 'Surname', 'Mother First Name': 'MSpanishName',
                          'Mother Last Name': 'MSurname', 'Father First Name': 'FSpanishName',
@@ -0,0 +1,77 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+from checkpoints import inputs_hash
+from match_person_parallel_functions import TOTAL_SCORE_COLUMNS, empty_candidates, top_candidates_per_row
+
+
+def row_fingerprints(frame: pd.DataFrame, id_column: str) -> np.ndarray:
+    """One uint64 content hash per row, ignoring the sequential id column."""
+    return pd.util.hash_pandas_object(frame.drop(columns=id_column), index=False).to_numpy()
+
+
+def appended_start(previous: np.ndarray, current: np.ndarray):
+    """
+    Position of the first appended row, or None when rows were edited, removed or reordered.
+
+    Ids are assigned by position (see add_identifiers), so earlier results stay valid only
+    when the earlier rows are an unchanged prefix of the current rows.
+    """
+    if previous is None or len(previous) > len(current) or not np.array_equal(previous, current[:len(previous)]):
+        return None
+    return len(previous)
+
+
+def merge_candidates(parts: list, ecpp_id_col: str, records_id_col: str, top_k: int = None) -> pd.DataFrame:
+    """
+    Merge candidate frames into the order a full run produces: by census id, then baptism id.
+
+    With top_k, each census row is re-ranked over its old and new candidates, which gives the
+    same top_k as scoring all pairs at once.
+    """
+    parts = [part for part in parts if part is not None and not part.empty]
+    if not parts:
+        return empty_candidates(ecpp_id_col, records_id_col)
+    merged = (pd.concat(parts, ignore_index=True)
+              .sort_values([ecpp_id_col, records_id_col], kind='stable')
+              .drop_duplicates([ecpp_id_col, records_id_col])
+              .reset_index(drop=True))
+    if top_k is not None:
+        merged = top_candidates_per_row(merged, merged[TOTAL_SCORE_COLUMNS].max(axis=1), ecpp_id_col, top_k)
+    return merged.reset_index(drop=True)
+
+
+class IncrementalState:
+    """
+    The scored candidates of the last run of each dataset, with the row fingerprints of the
+    census and baptisms they were computed from.
+
+    The state of a dataset is only used when its config, threshold, top_k and the MATCHING_VERSION
+    are unchanged.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, dataset_key: str) -> str:
+        return os.path.join(self.directory, f"{dataset_key}.pkl")
+
+    def load(self, dataset_key: str, inputs) -> dict:
+        """The saved state of dataset_key, or None if missing or computed with other inputs."""
+        path = self.path(dataset_key)
+        if not os.path.exists(path):
+            return None
+        state = pd.read_pickle(path)
+        if state.get('inputs_hash') != inputs_hash(inputs):
+            logging.info(f"Matching settings changed for {dataset_key}, rematching all of it")
+            return None
+        return state
+
+    def save(self, dataset_key: str, inputs, census_fingerprints: np.ndarray, baptism_fingerprints: np.ndarray,
+             candidates: pd.DataFrame):
+        path = self.path(dataset_key)
+        pd.to_pickle({'inputs_hash': inputs_hash(inputs), 'census_fingerprints': census_fingerprints,
+                      'baptism_fingerprints': baptism_fingerprints, 'candidates': candidates}, path + '.tmp')
+        os.replace(path + '.tmp', path)
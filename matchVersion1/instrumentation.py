@@ -0,0 +1,181 @@
+import cProfile
+import functools
+import glob
+import json
+import logging
+import os
+import pstats
+import resource
+import time
+import pandas as pd
+
+# Setting MATCH_PROFILE to a directory turns instrumentation on; MATCH_CPROFILE=1 also writes cProfile dumps.
+# Both live in the environment so that pool workers, forked or spawned, inherit them.
+PROFILE_ENV = 'MATCH_PROFILE'
+CPROFILE_ENV = 'MATCH_CPROFILE'
+
+STAT_FIELDS = ['calls', 'wall_seconds', 'cpu_seconds', 'rows_in', 'rows_out', 'memory_delta_mb']
+
+# Stage statistics of the current process, reset when a forked worker inherits the parent's copy.
+_stats = {'pid': None, 'stages': {}, 'profiles': {}, 'profiling': False}
+
+
+def enable(directory: str, cprofile: bool = False):
+    """Turn instrumentation on for this process and the workers it starts, clearing earlier stats in directory."""
+    os.makedirs(directory, exist_ok=True)
+    for pattern in ['stats-*.json', '*.prof']:
+        for file_path in glob.glob(os.path.join(directory, pattern)):
+            os.remove(file_path)
+    os.environ[PROFILE_ENV] = directory
+    os.environ[CPROFILE_ENV] = '1' if cprofile else ''
+
+
+def profile_directory():
+    """Returns the stats directory, or None when instrumentation is off."""
+    return os.environ.get(PROFILE_ENV) or None
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process; falls back to the peak RSS where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count_rows(value) -> int:
+    """Rows held by a stage input or output: a DataFrame, a dict of DataFrames or a PersonMatcher."""
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(frame) for frame in value.values() if isinstance(frame, pd.DataFrame))
+    if isinstance(getattr(value, 'matched_records', None), pd.DataFrame):
+        return len(value.matched_records)
+    return 0
+
+
+def instrumented(function):
+    """
+    Record wall time, CPU time, rows in/out and the RSS change of every call when MATCH_PROFILE is set.
+
+    Rows in are counted from the first argument, rows out from the return value, or from
+    the first argument again for methods that update self.matched_records in place.
+    """
+    stage = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        directory = profile_directory()
+        if directory is None:
+            return function(*args, **kwargs)
+
+        rows_in = count_rows(args[0]) if args else 0
+        memory_start = current_rss_mb()
+        profiler = _start_profiler()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            if profiler is not None:
+                profiler.disable()
+                _stats['profiling'] = False
+                _stage_profile(stage).append(profiler)
+
+        rows_out = count_rows(result) if result is not None else (count_rows(args[0]) if args else 0)
+        record_stage(stage, wall, cpu, rows_in, rows_out, current_rss_mb() - memory_start)
+        flush(directory)
+        return result
+
+    return wrapper
+
+
+def _process_stats():
+    if _stats['pid'] != os.getpid():
+        _stats.update(pid=os.getpid(), stages={}, profiles={}, profiling=False)
+    return _stats
+
+
+def _stage_profile(stage):
+    return _process_stats()['profiles'].setdefault(stage, [])
+
+
+def _start_profiler():
+    # Only the outermost instrumented call is profiled; cProfile does not nest.
+    if not os.environ.get(CPROFILE_ENV) or _process_stats()['profiling']:
+        return None
+    profiler = cProfile.Profile()
+    _stats['profiling'] = True
+    profiler.enable()
+    return profiler
+
+
+def record_stage(stage, wall, cpu, rows_in, rows_out, memory_delta):
+    stats = _process_stats()['stages'].setdefault(stage, dict.fromkeys(STAT_FIELDS, 0))
+    stats['calls'] += 1
+    stats['wall_seconds'] += wall
+    stats['cpu_seconds'] += cpu
+    stats['rows_in'] += rows_in
+    stats['rows_out'] += rows_out
+    stats['memory_delta_mb'] += memory_delta
+
+
+def flush(directory: str):
+    """Write this process's stage stats, and its cProfile data per stage, into directory."""
+    stats = _process_stats()
+    pid = stats['pid']
+    with open(os.path.join(directory, f'stats-{pid}.json'), 'w') as file:
+        json.dump(stats['stages'], file)
+    for stage, profilers in stats['profiles'].items():
+        if profilers:
+            combined = pstats.Stats(profilers[0])
+            for profiler in profilers[1:]:
+                combined.add(profiler)
+            combined.dump_stats(os.path.join(directory, f'{stage}-{pid}.prof'))
+            stats['profiles'][stage] = [os.path.join(directory, f'{stage}-{pid}.prof')]
+
+
+def aggregate_stats(directory: str) -> pd.DataFrame:
+    """Sum the stage stats written by the parent and every worker into one row per stage."""
+    rows = []
+    for file_path in glob.glob(os.path.join(directory, 'stats-*.json')):
+        with open(file_path) as file:
+            for stage, stats in json.load(file).items():
+                rows.append(dict(stats, stage=stage))
+    if not rows:
+        return pd.DataFrame(columns=['stage', 'processes'] + STAT_FIELDS)
+    report = pd.DataFrame(rows).groupby('stage', sort=False)
+    report = report[STAT_FIELDS].sum().assign(processes=report.size()).reset_index()
+    return report[['stage', 'processes'] + STAT_FIELDS].sort_values('wall_seconds', ascending=False)
+
+
+def write_report(directory: str = None) -> pd.DataFrame:
+    """
+    Aggregate the stats of all processes into stage_report.csv and combine the per-process
+    cProfile dumps of each stage into <stage>.prof, readable with pstats.
+
+    Args:
+        directory (str): The stats directory, defaults to MATCH_PROFILE.
+
+    Returns:
+        pd.DataFrame: One row per stage, slowest first.
+    """
+    directory = directory or profile_directory()
+    if directory is None:
+        return None
+    flush(directory)
+    report = aggregate_stats(directory)
+    report.to_csv(os.path.join(directory, 'stage_report.csv'), index=False)
+
+    dumps = {}
+    for file_path in glob.glob(os.path.join(directory, '*-*.prof')):
+        dumps.setdefault(os.path.basename(file_path).rsplit('-', 1)[0], []).append(file_path)
+    for stage, file_paths in dumps.items():
+        pstats.Stats(*file_paths).dump_stats(os.path.join(directory, f'{stage}.prof'))
+
+    for row in report.itertuples():
+        logging.info(f"Stage {row.stage}: {row.calls} calls in {row.processes} processes, "
+                     f"wall {row.wall_seconds:.3f}s, cpu {row.cpu_seconds:.3f}s, "
+                     f"rows {row.rows_in} -> {row.rows_out}, memory {row.memory_delta_mb:+.1f} MB")
+    return report
@@ -1,12 +1,20 @@
 import logging
+import os
 import numpy as np
 import pandas as pd
 import time
 from data_processing import add_identifiers, clean_names_padrones, get_datasets
 from multiprocessing import Pool, cpu_count
-from person_matcher import PersonMatcher
+from person_matcher import PersonMatcher, decode_matched_criteria
+from person_matching_functions import shared_name_score_cache
+from shared_frames import SharedFrame, attach_frame
+from blocking import DEFAULT_BLOCKING_RULES, Blocker, blocking_recall_report
+from instrumentation import instrumented
 
+TOTAL_SCORE_COLUMNS = ['Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score']
 
+
+@instrumented
 def load_and_prepare_data(path: str) -> dict:
     """Load data and prepare it by adding identifiers and cleaning names, ensuring 'Age' column exists."""
     datasets = get_datasets(path)
@@ -22,10 +30,50 @@ def load_and_prepare_data(path: str) -> dict:
     return datasets
 
 
+def chunk_bounds(length: int, num_chunks: int) -> list:
+    """Split range(length) into at most num_chunks (start, stop) bounds."""
+    chunk_size = length // num_chunks + (length % num_chunks > 0)
+    return [(i, min(i + chunk_size, length)) for i in range(0, length, chunk_size)] if length else []
+
+
+def estimate_row_costs(census: pd.DataFrame, baptisms: pd.DataFrame, config: dict) -> np.ndarray:
+    """
+    Estimate the matching cost of every census row as its summed name length times its candidate count.
+
+    The candidate count is the number of baptisms without blocking or, when config has
+    blocking_rules, the row's blocking group sizes (Blocker.estimated_candidate_counts), so
+    the parent never builds the candidate pairs the workers will build again.
+    """
+    name_length = np.ones(len(census), dtype=np.int64)
+    for role in ['First Name', 'Last Name']:
+        name_length += census[config['census'][role]].fillna('').astype(str).str.len().to_numpy()
+
+    if config.get('blocking_rules'):
+        candidates = Blocker(config['blocking_rules']).estimated_candidate_counts(census, baptisms, config)
+    else:
+        candidates = np.full(len(census), len(baptisms), dtype=np.int64)
+    return name_length * np.maximum(candidates, 1)
+
+
+def cost_balanced_bounds(costs: np.ndarray, num_tasks: int) -> list:
+    """
+    Split range(len(costs)) into at most num_tasks contiguous (start, stop, cost) ranges of similar total cost.
+
+    A single row costing more than the per-task target becomes a task of its own.
+    """
+    if len(costs) == 0:
+        return []
+    cumulative = np.cumsum(costs)
+    targets = cumulative[-1] * np.arange(1, num_tasks) / num_tasks
+    cuts = np.searchsorted(cumulative, targets, side='left') + 1
+    edges = np.unique(np.concatenate(([0], np.clip(cuts, 0, len(costs)), [len(costs)])))
+    return [(int(start), int(stop), int(cumulative[stop - 1] - (cumulative[start - 1] if start else 0)))
+            for start, stop in zip(edges[:-1], edges[1:])]
+
+
 def chunk_dataframe(df: pd.DataFrame, num_chunks: int) -> list:
     """Chunk the dataframe into smaller parts, returning chunks along with their indices."""
-    chunk_size = len(df) // num_chunks + (len(df) % num_chunks > 0)
-    return [(df.iloc[i:i + chunk_size], i) for i in range(0, len(df), chunk_size)]
+    return [(df.iloc[start:stop], start) for start, stop in chunk_bounds(len(df), num_chunks)]
 
 
 def configure_and_match(census: pd.DataFrame, baptisms: pd.DataFrame, config: dict) -> PersonMatcher:
@@ -35,8 +83,57 @@ def configure_and_match(census: pd.DataFrame, baptisms: pd.DataFrame, config: di
     return matcher.matched_records
 
 
+def evaluate_blocking(census: pd.DataFrame, baptisms: pd.DataFrame, config: dict,
+                      rules=DEFAULT_BLOCKING_RULES, threshold: int = 3) -> pd.DataFrame:
+    """Score the full product once and report the true matches each blocking rule would lose."""
+    full_config = dict(config, blocking_rules=None)
+    full_matches = configure_and_match(census, baptisms, full_config)
+    return blocking_recall_report(full_matches, census, baptisms, full_config, rules, threshold)
+
+
+def select_top_candidates(matched_records: pd.DataFrame, config: dict, threshold: int, top_k: int = None) -> pd.DataFrame:
+    """
+    Keep only the pairs that can survive filter_matched_persons, reduced to the columns it reads.
+
+    A pair is kept when any total score reaches threshold. With top_k, only the top_k pairs per
+    census row (by best total score, ties in original order) are kept. Row order is preserved.
+    """
+    if matched_records.empty:
+        return matched_records
+
+    columns_to_keep = [config['records_id_col'], config['ecpp_id_col']] + TOTAL_SCORE_COLUMNS + ['Matched_Criteria_Mask']
+    best_score = matched_records[TOTAL_SCORE_COLUMNS].max(axis=1)
+    candidates = matched_records.loc[best_score >= threshold, columns_to_keep]
+
+    if top_k is not None:
+        candidates = top_candidates_per_row(candidates, best_score[candidates.index], config['ecpp_id_col'], top_k)
+
+    candidates = candidates.assign(Matched_Criteria=decode_matched_criteria(candidates['Matched_Criteria_Mask']))
+    return candidates.drop(columns='Matched_Criteria_Mask')
+
+
+def empty_candidates(ecpp_id_col: str, records_id_col: str) -> pd.DataFrame:
+    """A candidate frame without rows, with the columns and dtypes select_top_candidates returns."""
+    columns = {records_id_col: np.int32, ecpp_id_col: np.int32}
+    columns.update({score_column: np.uint8 for score_column in TOTAL_SCORE_COLUMNS})
+    columns['Matched_Criteria'] = object
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in columns.items()})
+
+
+def top_candidates_per_row(candidates: pd.DataFrame, best_score: pd.Series, ecpp_id_col: str, top_k: int) -> pd.DataFrame:
+    """Keep the top_k candidates of each census row by best_score, ties in row order, preserving row order."""
+    ranked = best_score.sort_values(ascending=False, kind='stable')
+    ranked_ids = candidates.loc[ranked.index, ecpp_id_col]
+    top_index = ranked_ids.groupby(ranked_ids, sort=False).head(top_k).index
+    return candidates.loc[candidates.index.isin(top_index)]
+
+
 def parallel_configure_and_match(data_info):
-    """Unpack data from the tuple and run the configure_and_match function with detailed logging."""
+    """
+    Unpack data from the tuple and run the configure_and_match function with detailed logging.
+
+    Returns None when the chunk fails, so a failure is never mistaken for a chunk without matches.
+    """
     census_data, baptisms_data, config, chunk_index = data_info
     start_time = time.time()
     try:
@@ -44,10 +141,18 @@ def parallel_configure_and_match(data_info):
         results = configure_and_match(census_data, baptisms_data, config)
         logging.info(f"Completed processing for chunk {chunk_index}")
         logging.info(f"Chunk {chunk_index} processing time: {time.time() - start_time} seconds")
+        shared_name_score_cache.log_stats(f"Name score cache after chunk {chunk_index}")
         return results
     except Exception as e:
         logging.error(f"Error processing chunk {chunk_index}: {str(e)}")
-        return pd.DataFrame()
+        return None
+
+
+def check_failed_chunks(failed: list, dataset_key: str):
+    """Raise once every task of dataset_key has run if any chunk failed, so no partial result is kept."""
+    if failed:
+        raise RuntimeError(f"{len(failed)} chunks of {dataset_key} failed (starting at census rows "
+                           f"{sorted(failed)}); see the errors logged above")
 
 
 def parallel_data_processing(dataset, baptisms, config, dataset_key):
@@ -62,6 +167,211 @@ def parallel_data_processing(dataset, baptisms, config, dataset_key):
     finally:
         pool.close()
         pool.join()
+    check_failed_chunks([index for (_, index), result in zip(chunks, results) if result is None], dataset_key)
     combined_results = pd.concat(results)
     logging.debug(f"Combined results count: {len(combined_results)}")
-    return combined_results
\ No newline at end of file
+    return combined_results
+
+
+# Worker-side state set once per process by init_matching_worker.
+_worker_state = {}
+
+
+def init_matching_worker(baptisms_handle: tuple, config: dict):
+    """Pool initializer: attach the shared baptisms table once for the lifetime of the worker."""
+    _worker_state['baptisms'] = attach_frame(baptisms_handle, 'baptisms')
+    _worker_state['config'] = config
+
+
+def shared_configure_and_match(task):
+    """Match one census chunk, given only its shared census handle and bounds, against the baptisms from baptisms_start on."""
+    census_handle, start, stop, config_key, chunk_index, baptisms_start = task
+    census = attach_frame(census_handle, 'census')
+    config = _worker_state['config'][config_key]
+    baptisms = _worker_state['baptisms'].iloc[baptisms_start:]
+    return parallel_configure_and_match((census.iloc[start:stop], baptisms, config, chunk_index))
+
+
+def indexed_configure_and_match(task):
+    """Match one census chunk and return it with its chunk index, so results can be put back in order."""
+    census_handle, start, stop, config_key, chunk_index, baptisms_start = task
+    return chunk_index, shared_configure_and_match(task)
+
+
+def stream_configure_and_match(task):
+    """Match one census chunk and return only its above-threshold top-k candidates."""
+    census_handle, start, stop, config_key, chunk_index, baptisms_start, threshold, top_k = task
+    results = shared_configure_and_match((census_handle, start, stop, config_key, chunk_index, baptisms_start))
+    if results is None:
+        return chunk_index, None
+    candidates = select_top_candidates(results, _worker_state['config'][config_key], threshold, top_k)
+    logging.info(f"Chunk {chunk_index} kept {len(candidates)} of {len(results)} scored pairs")
+    return chunk_index, candidates
+
+
+def timed_task(task):
+    """Run task_function(task_args) in a worker and report which process ran it and when."""
+    task_function, task_args = task
+    start_time = time.time()
+    result = task_function(task_args)
+    return os.getpid(), start_time, time.time(), result
+
+
+def log_worker_utilization(timings: list, label: str):
+    """
+    Log how busy each worker was between the first task start and the last task end.
+
+    Args:
+        timings (list): (pid, start_time, end_time) of every task.
+        label (str): Dataset the tasks belonged to.
+    """
+    if not timings:
+        return
+    span = max(end for _, _, end in timings) - min(start for _, start, _ in timings)
+    busy = {}
+    for pid, start, end in timings:
+        busy[pid] = busy.get(pid, 0.0) + end - start
+    for pid, seconds in sorted(busy.items()):
+        logging.info(f"{label}: worker {pid} busy {seconds:.2f}s of {span:.2f}s "
+                     f"({100 * seconds / span if span else 100:.0f}% utilization)")
+    idle = len(busy) * span - sum(busy.values())
+    logging.info(f"{label}: {len(timings)} tasks on {len(busy)} workers, {idle:.2f}s total idle time")
+
+
+class MatchingPool:
+    """
+    A long-lived worker pool for matching several census datasets against the same baptisms.
+
+    The baptisms table is published once through shared memory and attached by every worker
+    when it starts (numeric columns shared in place, see SharedFrame); each census dataset is
+    published once per process() call. Tasks only carry the census handle and chunk bounds,
+    instead of pickled DataFrames.
+
+    Each dataset is split into about tasks_per_worker cost-balanced tasks per worker (see
+    estimate_row_costs), handed out one at a time, most expensive first, so workers that
+    finish early pick up the remaining tasks instead of idling behind a slow chunk.
+
+    stream can match against only the baptisms from a given position on (for incremental
+    runs); the workers slice their shared baptisms, so no second pool is needed.
+    """
+
+    def __init__(self, baptisms: pd.DataFrame, config: dict, processes: int = None, tasks_per_worker: int = 8):
+        self.processes = processes or min(64, cpu_count())
+        self.tasks_per_worker = tasks_per_worker
+        self.config = config
+        self.baptisms_frame = baptisms
+        self.baptisms = SharedFrame(baptisms)
+        self.pool = Pool(processes=self.processes, initializer=init_matching_worker,
+                         initargs=(self.baptisms.handle, config))
+
+    def task_bounds(self, dataset: pd.DataFrame, config_key: str, baptisms_start: int = 0) -> list:
+        """Cost-balanced (start, stop) bounds of dataset, most expensive first."""
+        costs = estimate_row_costs(dataset, self.baptisms_frame.iloc[baptisms_start:], self.config[config_key])
+        bounds = cost_balanced_bounds(costs, self.processes * self.tasks_per_worker)
+        return [(start, stop) for start, stop, _ in sorted(bounds, key=lambda bound: -bound[2])]
+
+    def run_tasks(self, task_function, tasks: list, dataset_key: str):
+        """Yield task results in completion order, handing tasks out one at a time, and log utilization."""
+        timings = []
+        for pid, start_time, end_time, result in self.pool.imap_unordered(
+                timed_task, [(task_function, task) for task in tasks], chunksize=1):
+            timings.append((pid, start_time, end_time))
+            yield result
+        log_worker_utilization(timings, dataset_key)
+
+    def pending_tasks(self, dataset: pd.DataFrame, config_key: str, checkpoints=None, baptisms_start: int = 0):
+        """
+        Split dataset into task bounds and load the chunks already checkpointed.
+
+        Returns:
+            tuple: (bounds of the chunks still to run, [(chunk_index, result)] of the loaded chunks).
+        """
+        bounds = self.task_bounds(dataset, config_key, baptisms_start)
+        if checkpoints is None:
+            return bounds, []
+        pending, loaded = [], []
+        for start, stop in bounds:
+            result = checkpoints.load_chunk(dataset.iloc[start:stop])
+            if result is None:
+                pending.append((start, stop))
+            else:
+                loaded.append((start, result))
+        if loaded:
+            logging.info(f"Reusing {len(loaded)} of {len(bounds)} checkpointed chunks for {checkpoints.dataset_key}")
+        return pending, loaded
+
+    def process(self, dataset: pd.DataFrame, dataset_key: str, checkpoints=None) -> pd.DataFrame:
+        """
+        Run the PersonMatcher for every task of dataset and combine the results in census order.
+
+        With checkpoints (a checkpoints.CheckpointScope), chunks finished by an earlier run are
+        loaded instead of matched, and every newly finished chunk is checkpointed. Failed chunks
+        are never checkpointed: once the other tasks have finished, a RuntimeError is raised.
+        """
+        config_key = 'padrones_config' if 'padron' in dataset_key else 'census_config'
+        bounds, results = self.pending_tasks(dataset, config_key, checkpoints)
+        stops = dict(bounds)
+        failed = []
+        with SharedFrame(dataset) as census:
+            tasks = [(census.handle, start, stop, config_key, start, 0) for start, stop in bounds]
+            for chunk_index, result in self.run_tasks(indexed_configure_and_match, tasks, dataset_key):
+                if result is None:
+                    failed.append(chunk_index)
+                    continue
+                if checkpoints is not None:
+                    checkpoints.save_chunk(dataset.iloc[chunk_index:stops[chunk_index]], result)
+                results.append((chunk_index, result))
+        check_failed_chunks(failed, dataset_key)
+        combined_results = pd.concat([result for _, result in sorted(results, key=lambda item: item[0])])
+        logging.debug(f"Combined results count for {dataset_key}: {len(combined_results)}")
+        return combined_results
+
+    def stream(self, dataset: pd.DataFrame, dataset_key: str, threshold: int, top_k: int = None, checkpoints=None,
+               baptisms_start: int = 0):
+        """
+        Yield (chunk_index, candidates) as tasks finish, in completion order.
+
+        With baptisms_start, dataset is only matched against the baptisms from that position on;
+        checkpoints must then be None, as they are keyed by the full baptisms.
+
+        Workers apply the threshold and top_k before returning, so only the surviving
+        candidates of each task ever travel back to, or are held by, the parent. With
+        checkpoints, previously finished chunks are yielded first without being matched. Failed
+        chunks are neither yielded nor checkpointed; once the other tasks have finished, a
+        RuntimeError is raised.
+        """
+        config_key = 'padrones_config' if 'padron' in dataset_key else 'census_config'
+        bounds, loaded = self.pending_tasks(dataset, config_key, checkpoints, baptisms_start)
+        yield from loaded
+        stops = dict(bounds)
+        failed = []
+        with SharedFrame(dataset) as census:
+            tasks = [(census.handle, start, stop, config_key, start, baptisms_start, threshold, top_k)
+                     for start, stop in bounds]
+            for chunk_index, candidates in self.run_tasks(stream_configure_and_match, tasks, dataset_key):
+                if candidates is None:
+                    failed.append(chunk_index)
+                    continue
+                if checkpoints is not None:
+                    checkpoints.save_chunk(dataset.iloc[chunk_index:stops[chunk_index]], candidates)
+                yield chunk_index, candidates
+        check_failed_chunks(failed, dataset_key)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.baptisms.close()
+
+    def terminate(self):
+        self.pool.terminate()
+        self.pool.join()
+        self.baptisms.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -1,11 +1,19 @@
+import argparse
 import logging
+import os
+import numpy as np
 import pandas as pd
-from match_person_parallel_functions import load_and_prepare_data, parallel_data_processing
+from match_person_parallel_functions import empty_candidates, load_and_prepare_data, MatchingPool
+from person_matcher import decode_matched_criteria
 from data_processing import get_config
+from instrumentation import enable, instrumented, write_report
+from checkpoints import CheckpointStore, frame_hash
+from incremental import IncrementalState, appended_start, merge_candidates, row_fingerprints
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+@instrumented
 def filter_matched_persons(matched_persons: pd.DataFrame, dataset_key: str, threshold: int) -> pd.DataFrame:  # Change threshold type to int
     match_scores = {
         'Direct_Total_Match_Score': 'direct',
@@ -19,6 +27,11 @@ def filter_matched_persons(matched_persons: pd.DataFrame, dataset_key: str, thre
     results = []
     # max_matches = 4  # You can potentially remove this if not needed
 
+    if 'Matched_Criteria' not in matched_persons.columns and 'Matched_Criteria_Mask' in matched_persons.columns:
+        passing = matched_persons[list(match_scores)].max(axis=1) >= threshold
+        matched_persons = matched_persons[passing].assign(
+            Matched_Criteria=lambda df: decode_matched_criteria(df['Matched_Criteria_Mask']))
+
     for score, match_type in match_scores.items():
         filtered_persons = matched_persons[matched_persons[score] >= threshold][columns_to_keep].copy()  # Use the threshold for number of matches
         filtered_persons['match_type'] = match_type
@@ -31,59 +44,94 @@ def filter_matched_persons(matched_persons: pd.DataFrame, dataset_key: str, thre
     return combined_df
 
 
+def append_candidates(candidates: pd.DataFrame, dataset_key: str, file_path: str):
+    """Append one streamed chunk of candidates to file_path, writing the header only once."""
+    if candidates.empty:
+        return
+    candidates.assign(dataset_key=dataset_key).to_csv(
+        file_path, mode='a', index=False, header=not os.path.exists(file_path))
+
+
+# Output column -> Baptisms column, filled for every matched row.
+BAPTISM_COLUMNS = {
+    'baptismal_date': 'Date',
+    'location_ecpp_baptism': 'Mission',
+    'sex': 'Sex',
+    'origin_parish_1790_census': 'Place',
+    'notes_url_1790_census': 'Notes'
+}
+
+# match_type -> (output column -> Baptisms column), filled only for rows of that match type.
+MATCH_TYPE_COLUMNS = {
+    'direct': {
+        'first_name': 'SpanishName', 'last_name': 'Surname', 'ethnicity': 'Ethnicity',
+        'father_first_name': 'FSpanishName', 'father_last_name': 'FSurname',
+        'father_military_status': 'FMilitaryStatus', 'father_origin': 'FOrigin',
+        'mother_first_name': 'MSpanishName', 'mother_last_name': 'MSurname', 'mother_origin': 'MOrigin'
+    },
+    'mother': {
+        'first_name': 'SpanishName', 'last_name': 'Surname',
+        'mother_first_name': 'MSpanishName', 'mother_last_name': 'MSurname', 'ethnicity': 'MEthnicity'
+    },
+    'father': {
+        'first_name': 'SpanishName', 'last_name': 'Surname',
+        'father_first_name': 'FSpanishName', 'father_last_name': 'FSurname', 'ethnicity': 'FEthnicity'
+    }
+}
+
+# dataset_key -> race column. The race is read from the 1790 census by ecpp_id for every dataset.
+RACE_COLUMNS = {
+    'afro_1790_census': 'race_1790',
+    'padron_1781': 'race_1781',
+    'padron_1785': 'race_1785',
+    'padron_1821': 'race_1821',
+    'padron_267': 'race_267'
+}
+
+
+@instrumented
 def insert_matched_values(matched_persons_key: pd.DataFrame, datasets: dict) -> pd.DataFrame:
-    baptisms = datasets['baptisms'].set_index('#ID')
-    datasets_names = ['afro_1790_census', 'padron_1781', 'padron_1785', 'padron_1821', 'padron_267']
-    for name in datasets_names:
-        datasets[name] = datasets[name].set_index('ecpp_id')
-
-    for index, row in matched_persons_key.iterrows():
-        baptism_id = row['#ID']
-        census_id = row['ecpp_id']
-
-        matched_persons_key.at[index, 'baptismal_date'] = baptisms.at[baptism_id, 'Date']
-        matched_persons_key.at[index, 'location_ecpp_baptism'] = baptisms.at[baptism_id, 'Mission']
-        matched_persons_key.at[index, 'sex'] = baptisms.at[baptism_id, 'Sex']
-        matched_persons_key.at[index, 'origin_parish_1790_census'] = baptisms.at[baptism_id, 'Place']
-        matched_persons_key.at[index, 'notes_url_1790_census'] = baptisms.at[baptism_id, 'Notes']
-        matched_persons_key.at[index, 'matched_criteria'] = row['Matched_Criteria']
-
-        if row['match_type'] == 'direct':
-            matched_persons_key.at[index, 'first_name'] = baptisms.at[baptism_id, 'SpanishName']
-            matched_persons_key.at[index, 'last_name'] = baptisms.at[baptism_id, 'Surname']
-            matched_persons_key.at[index, 'ethnicity'] = baptisms.at[baptism_id, 'Ethnicity']
-            matched_persons_key.at[index, 'father_first_name'] = baptisms.at[baptism_id, 'FSpanishName']
-            matched_persons_key.at[index, 'father_last_name'] = baptisms.at[baptism_id, 'FSurname']
-            matched_persons_key.at[index, 'father_military_status'] = baptisms.at[baptism_id, 'FMilitaryStatus']
-            matched_persons_key.at[index, 'father_origin'] = baptisms.at[baptism_id, 'FOrigin']
-            matched_persons_key.at[index, 'mother_first_name'] = baptisms.at[baptism_id, 'MSpanishName']
-            matched_persons_key.at[index, 'mother_last_name'] = baptisms.at[baptism_id, 'MSurname']
-            matched_persons_key.at[index, 'mother_origin'] = baptisms.at[baptism_id, 'MOrigin']
-            
-        if row['match_type'] == 'mother':
-            matched_persons_key.at[index, 'first_name'] = baptisms.at[baptism_id, 'SpanishName']
-            matched_persons_key.at[index, 'last_name'] = baptisms.at[baptism_id, 'Surname']
-            matched_persons_key.at[index, 'mother_first_name'] = baptisms.at[baptism_id, 'MSpanishName']
-            matched_persons_key.at[index, 'mother_last_name'] = baptisms.at[baptism_id, 'MSurname']
-            matched_persons_key.at[index, 'ethnicity'] = baptisms.at[baptism_id, 'MEthnicity']
-
-        elif row['match_type'] == 'father':
-            matched_persons_key.at[index, 'first_name'] = baptisms.at[baptism_id, 'SpanishName']
-            matched_persons_key.at[index, 'last_name'] = baptisms.at[baptism_id, 'Surname']
-            matched_persons_key.at[index, 'father_first_name'] = baptisms.at[baptism_id, 'FSpanishName']
-            matched_persons_key.at[index, 'father_last_name'] = baptisms.at[baptism_id, 'FSurname']
-            matched_persons_key.at[index, 'ethnicity'] = baptisms.at[baptism_id, 'FEthnicity']
-
-        if row['dataset_key'] == 'afro_1790_census':
-            matched_persons_key.at[index, 'race_1790'] = datasets['afro_1790_census'].at[census_id, 'Race']
-        elif row['dataset_key'] == 'padron_1781':
-            matched_persons_key.at[index, 'race_1781'] = datasets['afro_1790_census'].at[census_id, 'Race']
-        elif row['dataset_key'] == 'padron_1785':
-            matched_persons_key.at[index, 'race_1785'] = datasets['afro_1790_census'].at[census_id, 'Race']
-        elif row['dataset_key'] == 'padron_1821':
-            matched_persons_key.at[index, 'race_1821'] = datasets['afro_1790_census'].at[census_id, 'Race']
-        elif row['dataset_key'] == 'padron_267':
-            matched_persons_key.at[index, 'race_267'] = datasets['afro_1790_census'].at[census_id, 'Race']
+    """
+    Add the baptism and census attributes of every matched pair to matched_persons_key.
+
+    Baptism attributes are joined once by #ID and the 1790 census race once by ecpp_id; the
+    columns that depend on match_type or dataset_key are then filled through row masks.
+    Rows without a value for a column (e.g. mother_father rows for the parents' names) get NaN.
+
+    Args:
+        matched_persons_key (pd.DataFrame): Combined matches with #ID, ecpp_id, match_type,
+            dataset_key and Matched_Criteria columns. Updated in place.
+        datasets (dict): The loaded datasets, including 'baptisms' and 'afro_1790_census'.
+
+    Returns:
+        pd.DataFrame: matched_persons_key with the attribute columns added.
+    """
+    baptism_columns = sorted(set(BAPTISM_COLUMNS.values()) |
+                             {column for columns in MATCH_TYPE_COLUMNS.values() for column in columns.values()})
+    baptisms = datasets['baptisms'].set_index('#ID')[baptism_columns]
+    baptisms = baptisms.reindex(matched_persons_key['#ID'].to_numpy())
+    census_race = datasets['afro_1790_census'].set_index('ecpp_id')['Race']
+    census_race = census_race.reindex(matched_persons_key['ecpp_id'].to_numpy()).to_numpy(dtype=object)
+
+    def masked(values_by_mask):
+        column = np.full(len(matched_persons_key), np.nan, dtype=object)
+        for mask, values in values_by_mask:
+            column[mask] = values[mask]
+        return column
+
+    for target, source in BAPTISM_COLUMNS.items():
+        matched_persons_key[target] = baptisms[source].to_numpy(dtype=object)
+    matched_persons_key['matched_criteria'] = matched_persons_key['Matched_Criteria']
+
+    match_type = matched_persons_key['match_type'].to_numpy()
+    targets = list(dict.fromkeys(target for columns in MATCH_TYPE_COLUMNS.values() for target in columns))
+    for target in targets:
+        matched_persons_key[target] = masked([(match_type == kind, baptisms[columns[target]].to_numpy(dtype=object))
+                                              for kind, columns in MATCH_TYPE_COLUMNS.items() if target in columns])
+
+    dataset_key = matched_persons_key['dataset_key'].to_numpy()
+    for key, target in RACE_COLUMNS.items():
+        matched_persons_key[target] = masked([(dataset_key == key, census_race)])
 
     return matched_persons_key
 
@@ -122,52 +170,214 @@ def reorder_columns(df):
     return df[new_column_order]
 
 
+SCORE_COLUMNS = ['Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score']
+
+
+@instrumented
 def combine_parental_matches(df: pd.DataFrame) -> pd.DataFrame:
     """
     Combines rows where individuals have been matched through both parents,
     prioritizing data from direct matches.
-    """
 
-    def combine_rows(group):
-        direct_match = group[group['match_type'] == 'Direct']
-        if not direct_match.empty:
-            combined_row = direct_match.iloc[0].copy()
-        else:
-            combined_row = group.iloc[0].copy()
-
-        if len(group) > 1:
-            for col in ['Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score']:
-                combined_row[col] = group[col].max()
-            
-            # Combine data from other columns, prioritizing direct match if available
-            for col in group.columns:
-                if col not in ['Direct_Total_Match_Score', 'Mother_Total_Match_Score', 'Father_Total_Match_Score', 'match_type', '#ID', 'ecpp_id']:
-                    direct_value = direct_match[col].values[0] if not direct_match.empty else None
-                    mother_value = group[group['match_type'] == 'mother'][col].values[0] if not group[group['match_type'] == 'mother'].empty else None
-                    father_value = group[group['match_type'] == 'father'][col].values[0] if not group[group['match_type'] == 'father'].empty else None
-
-                    combined_row[col] = direct_value or mother_value or father_value  # Prioritize direct, then mother, then father
+    Rows are grouped by (#ID, ecpp_id) and returned in key order. Single-row groups are kept
+    as they are. A group of several rows becomes one 'mother_father' row with the maximum of
+    each total score; every other column takes the first truthy value of the group's first
+    'Direct', 'mother' and 'father' rows, in that order, else the father value (or None).
+    """
+    keys = ['#ID', 'ecpp_id']
+    df = df.dropna(subset=keys).sort_values(keys, kind='stable')
+    repeated = df.duplicated(keys, keep=False).to_numpy()
+    single, grouped = df[~repeated], df[repeated]
+    if grouped.empty:
+        return single.reset_index(drop=True)
+
+    combined = grouped.groupby(keys, sort=True)[SCORE_COLUMNS].max()
+    group_keys = combined.index
+    priority = ['Direct', 'mother', 'father']
+    first_rows = {match_type: grouped[grouped['match_type'] == match_type].drop_duplicates(keys).set_index(keys)
+                  for match_type in priority}
+    present = {match_type: group_keys.isin(rows.index) for match_type, rows in first_rows.items()}
+
+    def first_values(match_type, col):
+        values = np.array(first_rows[match_type][col].reindex(group_keys), dtype=object)
+        values[~present[match_type]] = None
+        return values
+
+    def truthy(values):
+        return np.fromiter(map(bool, values), dtype=bool, count=len(values))
+
+    for col in df.columns:
+        if col in SCORE_COLUMNS + ['match_type'] + keys:
+            continue
+        direct_value, mother_value, father_value = [first_values(match_type, col) for match_type in priority]
+        combined[col] = np.where(truthy(direct_value), direct_value,
+                                 np.where(truthy(mother_value), mother_value, father_value))
+
+    combined['match_type'] = 'mother_father'
+    combined = combined.reset_index()[list(df.columns)]
+    return (pd.concat([single, combined], ignore_index=True)
+            .sort_values(keys, kind='stable')
+            .reset_index(drop=True))
+
+
+def collect_stream(pool: MatchingPool, dataset: pd.DataFrame, dataset_key: str, threshold: int, top_k: int,
+                   candidates_path: str = None, checkpoints=None, baptisms_start: int = 0) -> pd.DataFrame:
+    """Stream dataset through pool, appending each chunk to candidates_path, and return the candidates in census order."""
+    streamed = []
+    for chunk_index, candidates in pool.stream(dataset, dataset_key, threshold, top_k, checkpoints, baptisms_start):
+        if candidates_path is not None:
+            append_candidates(candidates, dataset_key, candidates_path)
+        streamed.append((chunk_index, candidates))
+    if not streamed:
+        config = pool.config['padrones_config' if 'padron' in dataset_key else 'census_config']
+        return empty_candidates(config['ecpp_id_col'], config['records_id_col'])
+    return pd.concat([candidates for _, candidates in sorted(streamed, key=lambda item: item[0])])
+
+
+def match_dataset_incrementally(pool: MatchingPool, dataset: pd.DataFrame, dataset_key: str, threshold: int,
+                                top_k: int, config: dict, previous: pd.DataFrame, census_start: int,
+                                baptisms_start: int) -> pd.DataFrame:
+    """
+    Update the candidates of a previous run after census or baptism rows were appended.
+
+    Only the new census rows are matched against all baptisms, and the old census rows
+    against the new baptisms, on the same pool; the results are merged with the previous
+    candidates into the order and top_k of a full run.
+
+    Args:
+        pool (MatchingPool): The pool holding all baptisms.
+        dataset (pd.DataFrame): The full census dataset.
+        dataset_key (str): Name of the dataset.
+        threshold (int): Minimum total score of a candidate.
+        top_k (int): Maximum candidates per census row, or None.
+        config (dict): The matching configuration of the dataset.
+        previous (pd.DataFrame): Candidates of the previous run.
+        census_start (int): Position of the first appended census row.
+        baptisms_start (int): Position of the first appended baptism row.
+
+    Returns:
+        pd.DataFrame: The merged candidates.
+    """
+    parts = [previous]
+    if census_start < len(dataset):
+        parts.append(collect_stream(pool, dataset.iloc[census_start:], dataset_key, threshold, top_k))
+    if baptisms_start < len(pool.baptisms_frame) and census_start > 0:
+        parts.append(collect_stream(pool, dataset.iloc[:census_start], dataset_key, threshold, top_k,
+                                    baptisms_start=baptisms_start))
+    logging.info(f"Incremental {dataset_key}: {len(dataset) - census_start} new census rows, "
+                 f"{len(pool.baptisms_frame) - baptisms_start} new baptisms")
+    return merge_candidates(parts, config['ecpp_id_col'], config['records_id_col'], top_k)
+
+
+def match_dataset(pool: MatchingPool, dataset: pd.DataFrame, dataset_key: str, stream: bool, threshold: int,
+                  top_k: int, candidates_path: str, checkpoints=None) -> pd.DataFrame:
+    """
+    Match one census dataset against the baptisms, reusing its checkpoints when given.
+
+    If any chunk fails, the pool raises RuntimeError before the dataset is checkpointed; the
+    chunks that did finish are checkpointed, so a rerun only matches the failed ones.
+
+    Args:
+        pool (MatchingPool): The pool holding the baptisms.
+        dataset (pd.DataFrame): The census dataset to match.
+        dataset_key (str): Name of the dataset, e.g. 'padron_1781'.
+        stream (bool): Keep only streamed top candidates (see MatchingPool.stream).
+        threshold (int): Minimum total score kept when streaming.
+        top_k (int): Maximum candidates per census row when streaming.
+        candidates_path (str): CSV the streamed candidates are appended to.
+        checkpoints (CheckpointScope): Dataset and chunk checkpoints of this dataset, or None.
+
+    Returns:
+        pd.DataFrame: The matched records, or the streamed candidates, in census order.
+    """
+    matched_persons = checkpoints.load_dataset(dataset) if checkpoints is not None else None
+    if matched_persons is not None:
+        if stream:
+            append_candidates(matched_persons, dataset_key, candidates_path)
+        return matched_persons
 
-            combined_row['match_type'] = 'mother_father'  # Update match type
-        return combined_row
+    if stream:
+        matched_persons = collect_stream(pool, dataset, dataset_key, threshold, top_k, candidates_path, checkpoints)
+    else:
+        matched_persons = pool.process(dataset, dataset_key, checkpoints)
 
-    df = df.groupby(['#ID', 'ecpp_id']).apply(combine_rows).reset_index(drop=True)
-    return df
+    if checkpoints is not None:
+        checkpoints.save_dataset(dataset, matched_persons)
+    return matched_persons
 
 
-def main():
+def main(stream: bool = False, top_k: int = None, threshold: int = 3, profile: str = None, cprofile: bool = False,
+         resume: bool = False, incremental: bool = False):
+    """
+    Match every census dataset against the baptisms and write people_collect_2.csv.
+
+    By default every dataset is matched in full and only people_collect_2.csv is written, as
+    before; stream, resume and incremental are opt-in.
+
+    With stream, workers return only candidates above threshold (at most top_k per census row),
+    which are appended to matched_candidates.csv as chunks finish. With profile (or MATCH_PROFILE
+    set), per-stage timings of all processes are collected in that directory and summarized in
+    stage_report.csv; cprofile also writes one pstats file per stage. With resume, finished
+    datasets and chunks are checkpointed under data_output/checkpoints and reused by later runs
+    whose census, baptisms, config and mode are unchanged.
+
+    With incremental, the candidates of every dataset are kept under data_output/incremental
+    together with row fingerprints of its inputs. When a later run only finds rows appended to
+    the census or baptisms files, it matches just the new pairs and merges them in; any other
+    change rematches the dataset. people_collect_2.csv is then rebuilt from the merged candidates,
+    exactly as a full run would build it.
+    """
+    if incremental and not stream:
+        raise ValueError("Incremental matching keeps the streamed candidates; use stream=True")
+    if profile:
+        enable(profile, cprofile)
     path = '/home/acolinhe/AfricanCalifornios/matchVersion1/data'
     output_path = '/home/acolinhe/AfricanCalifornios/matchVersion1/data_output'
+    candidates_path = output_path + '/matched_candidates.csv'
     config = get_config()
     datasets = load_and_prepare_data(path)
+    baptisms = datasets['baptisms']
     matched_persons_key = []
-
-    for dataset_key in datasets:
-        if dataset_key == 'baptisms' or datasets[dataset_key] is None:
-            continue
-        matched_persons = parallel_data_processing(datasets[dataset_key], datasets['baptisms'], config, dataset_key)
-        matched_persons_key.append(filter_matched_persons(matched_persons, dataset_key, 3))
-        logging.info(f"Completed filtering {dataset_key}")
+    checkpoint_store = CheckpointStore(output_path + '/checkpoints') if resume else None
+    baptisms_hash = frame_hash(baptisms) if resume else None
+    state = IncrementalState(output_path + '/incremental') if incremental else None
+    baptism_fingerprints = row_fingerprints(baptisms, '#ID') if incremental else None
+
+    if stream and os.path.exists(candidates_path):
+        os.remove(candidates_path)
+
+    with MatchingPool(baptisms, config) as pool:
+        for dataset_key in datasets:
+            if dataset_key == 'baptisms' or datasets[dataset_key] is None:
+                continue
+            dataset = datasets[dataset_key]
+            config_key = 'padrones_config' if 'padron' in dataset_key else 'census_config'
+            checkpoints = None
+            if checkpoint_store is not None:
+                checkpoints = checkpoint_store.scope(dataset_key, baptisms_hash, config[config_key],
+                                                     stream, threshold, top_k)
+
+            previous = census_start = baptisms_start = None
+            if state is not None:
+                inputs = (config[config_key], threshold, top_k, list(dataset.columns), list(baptisms.columns))
+                census_fingerprints = row_fingerprints(dataset, 'ecpp_id')
+                previous = state.load(dataset_key, inputs)
+                if previous is not None:
+                    census_start = appended_start(previous['census_fingerprints'], census_fingerprints)
+                    baptisms_start = appended_start(previous['baptism_fingerprints'], baptism_fingerprints)
+
+            if census_start is not None and baptisms_start is not None:
+                matched_persons = match_dataset_incrementally(pool, dataset, dataset_key, threshold, top_k,
+                                                              config[config_key], previous['candidates'],
+                                                              census_start, baptisms_start)
+                append_candidates(matched_persons, dataset_key, candidates_path)
+            else:
+                matched_persons = match_dataset(pool, dataset, dataset_key, stream, threshold, top_k,
+                                                candidates_path, checkpoints)
+            if state is not None:
+                state.save(dataset_key, inputs, census_fingerprints, baptism_fingerprints, matched_persons)
+            matched_persons_key.append(filter_matched_persons(matched_persons, dataset_key, threshold))
+            logging.info(f"Completed filtering {dataset_key}")
 
     combined_matched_persons_key = pd.concat(matched_persons_key, ignore_index=True)
     
@@ -180,7 +390,19 @@ def main():
     final_people_collect_2.to_csv(output_path + '/people_collect_2.csv', index=False)
     logging.info(f"people_collect_2.csv columns {final_people_collect_2.columns}")
     logging.info(f"Completed matches and saved to {output_path + '/people_collect_2.csv'}")
+    write_report()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Match census datasets against baptisms.')
+    parser.add_argument('--profile', metavar='DIR', help='collect per-stage timings into DIR')
+    parser.add_argument('--cprofile', action='store_true', help='with --profile, also write cProfile stats per stage')
+    parser.add_argument('--stream', action='store_true',
+                        help='keep only candidates above the threshold, appended to matched_candidates.csv')
+    parser.add_argument('--top-k', type=int, help='with --stream, keep at most this many candidates per census row')
+    parser.add_argument('--resume', action='store_true', help='checkpoint finished datasets and chunks, and reuse them')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only match rows appended since the last run (implies --stream)')
+    args = parser.parse_args()
+    main(stream=args.stream or args.incremental, top_k=args.top_k, profile=args.profile, cprofile=args.cprofile,
+         resume=args.resume, incremental=args.incremental)
\ No newline at end of file
@@ -1,13 +1,36 @@
 from person_matching_functions import *
+import numpy as np
 import pandas as pd
-from itertools import product
 import logging
+from blocking import Blocker
+from instrumentation import instrumented, profile_directory
+
+# Score column and label of every matched criterion, in Matched_Criteria order; bit i of the mask is entry i.
+MATCHED_CRITERIA = [
+    ('First_Name_Match_Score', 'First Name'),
+    ('Last_Name_Match_Score', 'Last Name'),
+    ('Age_Match_Score', 'Age'),
+    ('Gender_Match_Score', 'Gender')
+]
+
+MATCHED_CRITERIA_TEXT = np.array([', '.join(label for bit, (_, label) in enumerate(MATCHED_CRITERIA) if mask >> bit & 1)
+                                  for mask in range(1 << len(MATCHED_CRITERIA))], dtype=object)
+
+
+def decode_matched_criteria(mask) -> np.ndarray:
+    """Decode Matched_Criteria_Mask values into the Matched_Criteria strings of get_matched_criteria."""
+    return MATCHED_CRITERIA_TEXT[np.asarray(mask, dtype=np.intp)]
+
 
 class PersonMatcher:
-    def __init__(self, census, baptisms, config):
+    def __init__(self, census, baptisms, config, blocker=None, name_cache=None):
         self.ecpp = census
         self.records = baptisms
         self.config = config
+        self.name_cache = shared_name_score_cache if name_cache is None else name_cache
+        if blocker is None and config.get('blocking_rules'):
+            blocker = Blocker(config['blocking_rules'])
+        self.blocker = blocker
         self.matched_records = pd.DataFrame()
 
     def match(self):
@@ -21,87 +44,168 @@ class PersonMatcher:
         self.list_matched_criteria()
         return
 
+    @instrumented
     def calculate_total_match_score(self, score_column_name):
-        self.matched_records[score_column_name] = 0
+        self.matched_records[score_column_name] = np.zeros(len(self.matched_records), dtype=np.uint8)
         for score_column in ["First_Name_Match_Score", "Last_Name_Match_Score", "Gender_Match_Score", "Age_Match_Score"]:
             if score_column in self.matched_records.columns:
                 self.matched_records[score_column_name] += self.matched_records[score_column]
 
+    @instrumented
     def create_matched_records(self):
-        ecpp_ids = self.ecpp.reset_index()[self.config['ecpp_id_col']]
-        records_ids = self.records.reset_index()[self.config['records_id_col']]
+        """
+        Build the compact pair frame: int32 row positions into both sides, the two id columns and,
+        later, uint8 score columns. Name, gender and age values stay on the census/baptism side as
+        integer codes (see encode_fields) and are only looked up through the row positions;
+        materialize_attributes adds the Census_/Baptisms_ columns for the rows that need them.
+        """
+        self.encode_fields()
 
-        self.matched_records = pd.DataFrame(product(ecpp_ids, records_ids),
-                                            columns=[self.config['ecpp_id_col'], self.config['records_id_col']])
-
-        for key, value in self.config['census'].items():
-            self.matched_records[f'Census_{value}'] = self.matched_records[self.config['ecpp_id_col']].map(
-                self.ecpp.set_index(self.config['ecpp_id_col'])[value])
+        if self.blocker is not None:
+            positions = self.blocker.candidate_positions(self.ecpp, self.records, self.config)
+            census_rows = positions['census_pos'].to_numpy(dtype=np.int32)
+            baptism_rows = positions['baptism_pos'].to_numpy(dtype=np.int32)
+            logging.info(f"Blocking kept {len(census_rows)} of {len(self.ecpp) * len(self.records)} candidate pairs")
+        else:
+            census_rows = np.repeat(np.arange(len(self.ecpp), dtype=np.int32), len(self.records))
+            baptism_rows = np.tile(np.arange(len(self.records), dtype=np.int32), len(self.ecpp))
 
-        for key, value in self.config['baptisms'].items():
-            self.matched_records[f'Baptisms_{value}'] = self.matched_records[self.config['records_id_col']].map(
-                self.records.set_index(self.config['records_id_col'])[value])
+        self.matched_records = pd.DataFrame({
+            self.config['ecpp_id_col']: compact_ids(self.ecpp[self.config['ecpp_id_col']])[census_rows],
+            self.config['records_id_col']: compact_ids(self.records[self.config['records_id_col']])[baptism_rows],
+            'census_row': census_rows,
+            'baptism_row': baptism_rows
+        })
+        self.log_memory_per_pair()
 
         return self.matched_records
 
+    def encode_fields(self):
+        """Integer-encode every configured field once per side: codes per record plus the distinct values."""
+        self.census_fields = {value: pd.factorize(self.ecpp[value]) for value in self.config['census'].values()
+                              if value in self.ecpp.columns}
+        self.baptism_fields = {value: pd.factorize(self.records[value]) for value in self.config['baptisms'].values()
+                               if value in self.records.columns}
+
+    def pair_codes(self, census_value, baptism_value):
+        """Per-pair codes of one census field and one baptism field (-1 where the value is missing)."""
+        census_codes, census_uniques = self.census_fields[census_value]
+        baptism_codes, baptism_uniques = self.baptism_fields[baptism_value]
+        return (census_codes[self.matched_records['census_row'].to_numpy()], census_uniques,
+                baptism_codes[self.matched_records['baptism_row'].to_numpy()], baptism_uniques)
+
+    def score_distinct_pairs(self, census_value, baptism_value, score_function):
+        """
+        Evaluate score_function(census_values, baptism_values) once per distinct pair of present values
+        and broadcast the result to every pair row as uint8; pairs with a missing value score 0.
+        """
+        census_codes, census_uniques, baptism_codes, baptism_uniques = self.pair_codes(census_value, baptism_value)
+        scores = np.zeros(len(census_codes), dtype=np.uint8)
+        present = (census_codes >= 0) & (baptism_codes >= 0)
+        if not present.any():
+            return scores
+
+        keys = census_codes[present].astype(np.int64) * len(baptism_uniques) + baptism_codes[present]
+        distinct_keys, inverse = np.unique(keys, return_inverse=True)
+        distinct_scores = score_function(np.asarray(census_uniques, dtype=object)[distinct_keys // len(baptism_uniques)],
+                                         np.asarray(baptism_uniques, dtype=object)[distinct_keys % len(baptism_uniques)])
+        scores[present] = np.asarray(distinct_scores, dtype=np.uint8)[inverse]
+        return scores
+
+    @instrumented
     def direct_match_names(self):
-        self.matched_records['First_Name_Match_Score'] = self.matched_records.apply(
-            lambda row: self.match_name_score(
-                row[f'Census_{self.config["census"]["First Name"]}'],
-                row[f'Baptisms_{self.config["baptisms"]["First Name"]}']
-            ), axis=1
-        )
-
-        self.matched_records['Last_Name_Match_Score'] = self.matched_records.apply(
-            lambda row: self.match_name_score(
-                row[f'Census_{self.config["census"]["Last Name"]}'],
-                row[f'Baptisms_{self.config["baptisms"]["Last Name"]}']
-            ), axis=1
-        )
+        self.matched_records['First_Name_Match_Score'] = self.batch_name_scores('First Name', 'First Name')
+        self.matched_records['Last_Name_Match_Score'] = self.batch_name_scores('Last Name', 'Last Name')
 
+    @instrumented
     def match_parents_names(self):
-        self.matched_records['Mother_First_Name_Match_Score'] = self.matched_records.apply(
-            lambda row: self.match_name_score(
-                row[f'Census_{self.config["census"]["First Name"]}'],
-                row[f'Baptisms_{self.config["baptisms"]["Mother First Name"]}']
-            ), axis=1
-        )
-        self.matched_records['Mother_Last_Name_Match_Score'] = self.matched_records.apply(
-            lambda row: self.match_name_score(
-                row[f'Census_{self.config["census"]["Last Name"]}'],
-                row[f'Baptisms_{self.config["baptisms"]["Mother Last Name"]}']
-            ), axis=1
-        )
-        self.matched_records['Father_First_Name_Match_Score'] = self.matched_records.apply(
-            lambda row: self.match_name_score(
-                row[f'Census_{self.config["census"]["First Name"]}'],
-                row[f'Baptisms_{self.config["baptisms"]["Father First Name"]}']
-            ), axis=1
-        )
-        self.matched_records['Father_Last_Name_Match_Score'] = self.matched_records.apply(
-            lambda row: self.match_name_score(
-                row[f'Census_{self.config["census"]["Last Name"]}'],
-                row[f'Baptisms_{self.config["baptisms"]["Father Last Name"]}']
-            ), axis=1
-        )
+        self.matched_records['Mother_First_Name_Match_Score'] = self.batch_name_scores('First Name', 'Mother First Name')
+        self.matched_records['Mother_Last_Name_Match_Score'] = self.batch_name_scores('Last Name', 'Mother Last Name')
+        self.matched_records['Father_First_Name_Match_Score'] = self.batch_name_scores('First Name', 'Father First Name')
+        self.matched_records['Father_Last_Name_Match_Score'] = self.batch_name_scores('Last Name', 'Father Last Name')
+
+    def batch_name_scores(self, census_field, baptisms_field):
+        """Vectorized match_name_score over every pair for one census/baptism name field."""
+        def name_scores(names_census, names_baptism):
+            return np.where(match_names_score_batch(names_census, names_baptism, self.name_cache) <= 2, 1, 0)
+
+        return self.score_distinct_pairs(self.config['census'][census_field],
+                                         self.config['baptisms'][baptisms_field], name_scores)
 
+    @instrumented
     def match_other_features(self):
         if 'Age' in self.config['census'] and f'Census_{self.config["census"]["Age"]}' in self.ecpp.columns:
-            self.matched_records['Age_Match_Score'] = self.matched_records.apply(
-                lambda row: self.match_age_score(
-                    row[f'Census_{self.config["census"]["Age"]}'],
-                    row[f'Baptisms_{self.config["baptisms"]["Age"]}']
-                ), axis=1
-            )
+            self.matched_records['Age_Match_Score'] = self.vectorized_age_scores(
+                self.config['census']['Age'], self.config['baptisms']['Age'])
         else:
-            self.matched_records['Age_Match_Score'] = 0  # Default to 0 if age data is missing
+            self.matched_records['Age_Match_Score'] = np.zeros(len(self.matched_records), dtype=np.uint8)  # Default to 0 if age data is missing
+
+        self.matched_records['Gender_Match_Score'] = self.vectorized_gender_scores(
+            self.config['census']['Gender'], self.config['baptisms']['Gender'])
+
+    def vectorized_gender_scores(self, census_value, baptism_value):
+        """Column-wise match_gender_score: both present and equal after str().lower()."""
+        census_codes, census_uniques, baptism_codes, baptism_uniques = self.pair_codes(census_value, baptism_value)
+        lowered = [str(gender).lower() for gender in census_uniques] + [str(gender).lower() for gender in baptism_uniques]
+        gender_ids, _ = pd.factorize(pd.Series(lowered, dtype=object))
+        # A trailing sentinel per side makes code -1 (missing) never compare equal.
+        census_ids = np.append(gender_ids[:len(census_uniques)], -1)
+        baptism_ids = np.append(gender_ids[len(census_uniques):], -2)
+        return (census_ids[census_codes] == baptism_ids[baptism_codes]).astype(np.uint8)
+
+    def vectorized_age_scores(self, census_value, baptism_value):
+        """Column-wise match_age_score: both ages convert to float and differ by at most 2 years."""
+        census_codes, census_uniques, baptism_codes, baptism_uniques = self.pair_codes(census_value, baptism_value)
+        census_ages = self.numeric_ages(census_uniques)
+        baptism_ages = self.numeric_ages(baptism_uniques)
+        with np.errstate(invalid='ignore'):
+            return (np.abs(census_ages[census_codes] - baptism_ages[baptism_codes]) <= 2).astype(np.uint8)  # Tolerance of +/- 2 years
+
+    @staticmethod
+    def numeric_ages(uniques):
+        """float() of every distinct age, NaN where it fails; the trailing NaN stands for missing (code -1)."""
+        ages = np.full(len(uniques) + 1, np.nan)
+        for position, age in enumerate(uniques):
+            try:
+                ages[position] = float(age)
+            except ValueError:
+                pass
+        return ages
+
+    def materialize_attributes(self, rows=None):
+        """
+        Return the pair rows (all when rows is None) with the Census_/Baptisms_ value columns of the
+        original wide layout, looked up from the encoded sides for just those rows.
+        """
+        records = self.matched_records if rows is None else self.matched_records.loc[rows]
+        materialized = records.copy()
+        for value, (codes, uniques) in self.census_fields.items():
+            materialized[f'Census_{value}'] = self.decode(codes, uniques, records['census_row'].to_numpy())
+        for value, (codes, uniques) in self.baptism_fields.items():
+            materialized[f'Baptisms_{value}'] = self.decode(codes, uniques, records['baptism_row'].to_numpy())
+        return materialized
+
+    @staticmethod
+    def decode(codes, uniques, rows):
+        values = pd.Series(uniques, dtype=object).reindex(codes[rows])
+        return values.to_numpy()
+
+    def memory_per_pair(self, sample_size=10000):
+        """Bytes per pair of the compact frame and of the materialized wide layout (estimated on a sample)."""
+        if self.matched_records.empty:
+            return {'compact': 0.0, 'materialized': 0.0}
+        compact = self.matched_records.memory_usage(deep=True).sum() / len(self.matched_records)
+        sample = self.matched_records.index[:sample_size]
+        materialized = self.materialize_attributes(sample).memory_usage(deep=True, index=False).sum() / len(sample)
+        return {'compact': compact, 'materialized': materialized}
 
-        self.matched_records['Gender_Match_Score'] = self.matched_records.apply(
-            lambda row: self.match_gender_score(
-                row[f'Census_{self.config["census"]["Gender"]}'],
-                row[f'Baptisms_{self.config["baptisms"]["Gender"]}']
-            ), axis=1
-        )
+    def log_memory_per_pair(self):
+        """Log memory_per_pair, only with MATCH_PROFILE set or debug logging on: it materializes a sample."""
+        if profile_directory() is None and not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+        memory = self.memory_per_pair()
+        logging.info(f"Pair frame memory: {memory['compact']:.1f} bytes/pair compact, "
+                     f"{memory['materialized']:.1f} bytes/pair with materialized attributes")
 
     def match_name_score(self, name_census, name_baptism):
         if pd.isna(name_census) or pd.isna(name_baptism):
@@ -142,8 +246,13 @@ class PersonMatcher:
             criteria.append('Gender')
         return ', '.join(criteria)
 
+    @instrumented
     def list_matched_criteria(self):
-        self.matched_records['Matched_Criteria'] = self.matched_records.apply(self.get_matched_criteria, axis=1)
+        """Store the matched criteria as a bitmask; decode_matched_criteria turns it into text for output rows."""
+        mask = np.zeros(len(self.matched_records), dtype=np.uint8)
+        for bit, (score_column, _) in enumerate(MATCHED_CRITERIA):
+            mask |= (self.matched_records[score_column].to_numpy() == 1).astype(np.uint8) << bit
+        self.matched_records['Matched_Criteria_Mask'] = mask
 
     def save_matched_records(self, filename):
         self.matched_records.to_pickle(filename)
\ No newline at end of file
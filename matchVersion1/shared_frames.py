@@ -0,0 +1,121 @@
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+from multiprocessing import resource_tracker, shared_memory
+
+# Numpy dtype kinds whose columns are shared as buffers: bool, signed/unsigned int, float, complex.
+SHARED_KINDS = 'biufc'
+ALIGNMENT = 64
+
+# Frames already attached by this worker process, keyed by role ('baptisms', 'census').
+_attached_frames = {}
+
+
+def is_shared_column(column: pd.Series) -> bool:
+    """Whether column is a plain numpy numeric column that can live in shared memory as is."""
+    return isinstance(column.dtype, np.dtype) and column.dtype.kind in SHARED_KINDS
+
+
+class SharedFrame:
+    """
+    A DataFrame published once into a named shared memory block.
+
+    Numeric columns are copied into the block as raw arrays; workers wrap them in numpy arrays
+    over the block's buffer, so every worker reads the same physical pages. Object and string
+    columns, and the index, cannot be shared that way: they are pickled into the block once and
+    each worker unpickles its own copy of them.
+
+    Pool tasks then only carry the small handle; each worker process attaches the frame the
+    first time it sees the handle and keeps it.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        shared, offset = [], 0
+        for position in range(frame.shape[1]):
+            column = frame.iloc[:, position]
+            if is_shared_column(column):
+                shared.append((position, column.dtype.str, offset))
+                offset += -(-column.dtype.itemsize * len(frame) // ALIGNMENT) * ALIGNMENT
+        shared_positions = {position for position, _, _ in shared}
+        rest = frame.iloc[:, [position for position in range(frame.shape[1]) if position not in shared_positions]]
+        layout = pickle.dumps((rest, shared, frame.columns), protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset + len(layout), 1))
+        for position, dtype, column_offset in shared:
+            array = np.ndarray(len(frame), dtype=dtype, buffer=self.shm.buf, offset=column_offset)
+            array[:] = frame.iloc[:, position].to_numpy()
+            del array
+        self.shm.buf[offset:offset + len(layout)] = layout
+        self.handle = (self.shm.name, offset, len(layout))
+
+    def close(self):
+        """Unlink the shared memory block. Workers keep their mappings of it until they drop the frame."""
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_untracked(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing block without registering it with the resource tracker.
+
+    The creating process owns the block and unlinks it; before Python 3.13 attaching registers it
+    as well, so the tracker would unlink it again or warn about a leak when the worker exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def release(role: str):
+    """Drop the frame attached for role and close its block, unless a caller still holds views of it."""
+    _, shm, _ = _attached_frames.pop(role)
+    try:
+        shm.close()
+    except BufferError:
+        pass  # the mapping is freed once the last view of the old frame is gone
+
+
+def attach_frame(handle: tuple, role: str) -> pd.DataFrame:
+    """
+    Attach the frame published under handle, once per worker process and role.
+
+    Its numeric columns are read-only views of the shared block. A new handle for the same
+    role replaces the previously attached frame, so a long-lived worker only ever holds the
+    current census next to the baptisms.
+    """
+    cached = _attached_frames.get(role)
+    if cached is not None and cached[0] == handle:
+        return cached[2]
+    if cached is not None:
+        del cached
+        release(role)
+
+    name, offset, size = handle
+    shm = open_untracked(name)
+    rest, shared, columns = pickle.loads(shm.buf[offset:offset + size])
+    data = {}
+    for position, dtype, column_offset in shared:
+        data[position] = np.ndarray(len(rest), dtype=dtype, buffer=shm.buf, offset=column_offset)
+        data[position].flags.writeable = False
+    unshared = (position for position in range(len(columns)) if position not in data)
+    data.update(zip(unshared, (rest.iloc[:, i] for i in range(rest.shape[1]))))
+    # copy=False keeps the shared arrays as the frame's blocks instead of private copies
+    frame = pd.DataFrame({position: data[position] for position in range(len(columns))}, index=rest.index, copy=False)
+    frame.columns = columns
+
+    _attached_frames[role] = (handle, shm, frame)
+    return frame
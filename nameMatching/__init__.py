@@ -0,0 +1,22 @@
+"""
+Name similarity shared by every matching pipeline: matchVersion0, matchVersion1 and the
+family tree builder in newPeopleMatchAlgo.
+
+    normalize         - strip accents, lowercase (and optionally particles)
+    cached_normalize  - normalize memoized per process, with interned results
+    distance          - weighted edit distance under a cost table
+    bounded_distance  - distance, exact only up to a cutoff
+    batch_distance    - bounded_distance over many pairs at once
+    score / batch_score - match probability of two names under dynamic_max_distance
+
+Scripts in the pipeline folders put the repository root on sys.path before importing it.
+"""
+from .batch import batch_distance
+from .compat import convert_age
+from .distance import bounded_distance, colonial_costs, custom_costs, distance, distance_engine
+from .engine import DistanceEngine
+from .index import NameIndex
+from .normalize import NormalizationCache, cached_normalize, normalize, shared_normalization_caches
+from .phonetic import phonetic_key
+from .score import (NameScoreCache, batch_score, calculate_match_probability, dynamic_max_distance,
+                    dynamic_max_distance_batch, score, shared_name_score_cache)
@@ -0,0 +1,102 @@
+import numpy as np
+from .distance import custom_costs, distance_engine
+
+
+def batch_distance(names1, names2, max_distances, cost_dict: dict = custom_costs, batch_size: int = 20000):
+    """
+    Calculates bounded_distance for many name pairs at once. Every pair returns exactly what
+    bounded_distance returns: the distance when it is at most its max_distance, otherwise
+    max_distance + 1.
+
+    The DP runs row by row over all pairs of a block at the same time; within a row the
+    insertion chain is resolved with a cumulative minimum instead of a Python loop. Cost tables
+    with multi-character rules or cheap insertions/deletions (colonial_costs) are not expressible
+    as a substitution matrix and are computed pair by pair with the DistanceEngine instead.
+
+    Args:
+        names1 (sequence of str): The first names, already normalized.
+        names2 (sequence of str): The second names, already normalized.
+        max_distances (np.ndarray): The maximum distance of every pair, e.g. dynamic_max_distance_batch.
+        cost_dict (dict): A dictionary of substitution costs {(chars1, chars2): cost}.
+        batch_size (int): Number of pairs processed together.
+
+    Returns:
+        np.ndarray: The distances as float64.
+    """
+
+    names1 = list(names1)
+    names2 = list(names2)
+    max_distances = np.asarray(max_distances, dtype=float)
+    distances = np.zeros(len(names1), dtype=float)
+    if not names1:
+        return distances
+
+    engine = distance_engine(cost_dict)
+    if engine.rules_by_last or engine.insertion or engine.deletion:
+        for position, (name1, name2, max_distance) in enumerate(zip(names1, names2, max_distances)):
+            distances[position] = engine.distance(name1, name2, max_distance)
+        return distances
+
+    # Same orientation as the DistanceEngine: the longer name drives the rows.
+    longer, shorter = [], []
+    for name1, name2 in zip(names1, names2):
+        if len(name1) < len(name2):
+            name1, name2 = name2, name1
+        longer.append(name1)
+        shorter.append(name2)
+    longer_lengths = np.fromiter((len(name) for name in longer), dtype=np.int64, count=len(longer))
+    shorter_lengths = np.fromiter((len(name) for name in shorter), dtype=np.int64, count=len(shorter))
+
+    empty = shorter_lengths == 0
+    distances[empty] = np.where(longer_lengths[empty] > max_distances[empty], max_distances[empty] + 1,
+                                longer_lengths[empty])
+
+    alphabet = sorted(set(''.join(longer)) | set(''.join(shorter)))
+    char_codes = {char: code for code, char in enumerate(alphabet)}
+    pad_code = len(alphabet)
+    substitution_costs = np.ones((pad_code + 1, pad_code + 1), dtype=np.int64)
+    for (char1, char2), cost in engine.substitution.items():
+        if char1 in char_codes and char2 in char_codes:
+            substitution_costs[char_codes[char1], char_codes[char2]] = cost
+    np.fill_diagonal(substitution_costs, 0)
+
+    # Blocks of similar row counts keep the padding small.
+    pending = np.flatnonzero(~empty)
+    pending = pending[np.argsort(longer_lengths[pending], kind='stable')]
+
+    for start in range(0, len(pending), batch_size):
+        block = pending[start:start + batch_size]
+        rows = int(longer_lengths[block].max())
+        columns = int(shorter_lengths[block].max())
+
+        longer_codes = np.full((len(block), rows), pad_code, dtype=np.int64)
+        shorter_codes = np.full((len(block), columns), pad_code, dtype=np.int64)
+        for position, pair in enumerate(block):
+            longer_codes[position, :longer_lengths[pair]] = [char_codes[char] for char in longer[pair]]
+            shorter_codes[position, :shorter_lengths[pair]] = [char_codes[char] for char in shorter[pair]]
+
+        block_longer_lengths = longer_lengths[block]
+        block_shorter_lengths = shorter_lengths[block]
+        column_index = np.arange(columns + 1)
+        offsets = np.arange(1, columns + 1)
+
+        previous_row = np.broadcast_to(column_index, (len(block), columns + 1))
+        for i in range(rows):
+            substitution = previous_row[:, :-1] + substitution_costs[longer_codes[:, i][:, None], shorter_codes]
+            best_step = np.minimum(previous_row[:, 1:] + 1, substitution)
+
+            # current_row[j + 1] = min(best_step[j], current_row[j] + 1), unrolled as a running minimum.
+            chain = np.empty((len(block), columns + 1), dtype=np.int64)
+            chain[:, 0] = i + 1
+            chain[:, 1:] = best_step - offsets
+            current_row = np.minimum.accumulate(chain, axis=1) + column_index
+
+            finished = np.flatnonzero(block_longer_lengths == i + 1)
+            if len(finished):
+                pairs = block[finished]
+                final = current_row[finished, block_shorter_lengths[finished]]
+                distances[pairs] = np.where(final > max_distances[pairs], max_distances[pairs] + 1, final)
+
+            previous_row = current_row
+
+    return distances
@@ -0,0 +1,65 @@
+"""
+The signatures of the matching functions the pipelines used before nameMatching existed.
+
+matchVersion0/person_matching_functions_v0.py, matchVersion1/person_matching_functions.py and
+newPeopleMatchAlgo/matchingFunctions.py re-export these, so notebooks and scripts that import
+those modules keep working unchanged.
+"""
+import pandas as pd
+from .batch import batch_distance
+from .distance import bounded_distance, custom_costs
+from .score import score
+
+
+def modified_levenshtein_distance(name1: str, name2: str, cost_dict: dict, dynamic_max_distance: int):
+    """
+    bounded_distance with the argument order of matchVersion0 and matchVersion1.
+
+    Args:
+        name1 (str): The first name.
+        name2 (str): The second name.
+        cost_dict (dict): A dictionary of substitution costs {(char1, char2): cost}.
+        dynamic_max_distance (int): The dynamic maximum distance to consider.
+
+    Returns:
+        int: The modified Levenshtein distance between the two names, or dynamic_max_distance + 1
+             when the distance exceeds the dynamic maximum distance.
+    """
+    return bounded_distance(name1, name2, dynamic_max_distance, cost_dict)
+
+
+def modified_levenshtein_distance_batch(names1, names2, cost_dict: dict, dynamic_max_distances, batch_size: int = 20000):
+    """batch_distance with the argument order of matchVersion1."""
+    return batch_distance(names1, names2, dynamic_max_distances, cost_dict, batch_size)
+
+
+def match_names_score(name1, name2, max_distance=5):
+    """
+    score with the signature of matchVersion0 and matchVersion1; max_distance was never used,
+    the cutoff is always dynamic_max_distance.
+    """
+    return score(name1, name2, custom_costs)
+
+
+def convert_age(x):
+    """
+    Converts age into a float, handling potential type inconsistencies.
+
+    Args:
+        x: The input age value.
+
+    Returns:
+        float: The converted age, or 0 if conversion fails.
+        None: If the input is already None.
+    """
+
+    if pd.isna(x):
+        return x
+
+    elif isinstance(x, str):
+        try:
+            return float(x)
+        except ValueError:
+            return 0
+    else:
+        return x
@@ -0,0 +1,67 @@
+from .engine import DistanceEngine
+
+# Zero-cost substitutions of colonial Spanish spelling, used by matchVersion0 and matchVersion1.
+custom_costs = {
+    ('b', 'v'): 0, ('v', 'b'): 0,
+    ('c', 's'): 0, ('s', 'c'): 0, ('c', 'z'): 0, ('z', 'c'): 0, ('s', 'z'): 0, ('z', 's'): 0,
+    ('i', 'y'): 0, ('y', 'i'): 0,
+    ('g', 'j'): 0, ('j', 'g'): 0,
+    ('c', 'q'): 0, ('q', 'c'): 0,
+    ('u', 'v'): 0, ('v', 'u'): 0
+}
+
+# custom_costs plus the multi-character and silent letter variations used by the family tree builder.
+colonial_costs = {
+    **custom_costs,
+    ('j', 'ph'): 0, ('ph', 'j'): 0,  # Joseph/Jose
+    ('ll', 'y'): 0, ('y', 'll'): 0,  # Llanos/Yanos
+    ('h', ''): 0, ('', 'h'): 0
+}
+
+# Cost tables compiled by distance_engine, keyed by id().
+_engines = {}
+
+
+def distance_engine(cost_dict: dict = custom_costs) -> DistanceEngine:
+    """Returns the DistanceEngine compiled from cost_dict, compiling it on first use."""
+    engine = _engines.get(id(cost_dict))
+    if engine is None or engine.cost_dict is not cost_dict:
+        engine = _engines[id(cost_dict)] = DistanceEngine(cost_dict)
+    return engine
+
+
+def distance(name1: str, name2: str, cost_dict: dict = custom_costs):
+    """
+    Calculates a modified Levenshtein distance between two normalized names, allowing for custom
+    substitution costs, including multi-character rules such as ('ll', 'y') and free
+    insertions/deletions such as ('h', '').
+
+    Args:
+        name1 (str): The first name, already normalized.
+        name2 (str): The second name, already normalized.
+        cost_dict (dict): A dictionary of substitution costs {(chars1, chars2): cost}.
+
+    Returns:
+        int: The modified Levenshtein distance between the two names.
+    """
+    return distance_engine(cost_dict).distance(name1, name2)
+
+
+def bounded_distance(name1: str, name2: str, max_distance, cost_dict: dict = custom_costs):
+    """
+    Calculates distance only as far as max_distance matters.
+
+    Only a diagonal band is filled, since alignments far off the diagonal cost more than
+    max_distance in insertions and deletions alone, and the computation stops as soon as
+    whole rows of the band exceed max_distance (see DistanceEngine.distance).
+
+    Args:
+        name1 (str): The first name, already normalized.
+        name2 (str): The second name, already normalized.
+        max_distance (float): The largest distance the caller distinguishes.
+        cost_dict (dict): A dictionary of substitution costs {(chars1, chars2): cost}.
+
+    Returns:
+        The same distance as distance() when it is at most max_distance, otherwise max_distance + 1.
+    """
+    return distance_engine(cost_dict).distance(name1, name2, max_distance)
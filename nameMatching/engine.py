@@ -0,0 +1,136 @@
+class DistanceEngine:
+    """
+    Weighted edit distance compiled from a cost table such as custom_costs or colonial_costs.
+
+    The table is split once into lookup tables:
+        - single character substitutions, e.g. ('b', 'v'): 0,
+        - insertion and deletion costs of single characters, e.g. ('h', ''): 0 deletes h for free,
+        - multi-character substitutions, e.g. ('ll', 'y'): 0 or ('j', 'ph'): 0, indexed by the
+          last character of their first side so each DP cell only checks the rules that can apply.
+    Unlisted substitutions, insertions and deletions cost 1.
+
+    Attributes:
+        cost_dict (dict): The cost table the engine was compiled from.
+    """
+
+    def __init__(self, cost_dict: dict):
+        self.cost_dict = cost_dict
+        self.substitution = {}
+        self.deletion = {}
+        self.insertion = {}
+        self.rules_by_last = {}
+        for (source, target), cost in cost_dict.items():
+            if len(source) == 1 and len(target) == 1:
+                self.substitution[(source, target)] = cost
+            elif source and not target:
+                self.deletion[source] = cost
+            elif target and not source:
+                self.insertion[target] = cost
+            elif source and target:
+                self.rules_by_last.setdefault(source[-1], []).append((source, target, cost))
+        # Characters that can be inserted or deleted for less than a full edit, and rules that change
+        # the length for less than the length difference, let an alignment drift off the diagonal cheaply.
+        self.cheap_chars = {char for char, cost in list(self.deletion.items()) + list(self.insertion.items()) if cost < 1}
+        self.drifting_rules = [(source, target) for rules in self.rules_by_last.values()
+                               for source, target, cost in rules
+                               if cost < abs(len(source) - len(target))]
+        self.max_rule_length = max([len(source) for rules in self.rules_by_last.values()
+                                    for source, _, _ in rules] + [1])
+
+    def distance(self, name1: str, name2: str, max_distance=None):
+        """
+        Calculates the weighted edit distance between two names.
+
+        Args:
+            name1 (str): The first name.
+            name2 (str): The second name.
+            max_distance (float): If given, only distances up to max_distance are exact; larger
+                ones are returned as max_distance + 1, which lets the computation stay inside a
+                diagonal band and stop early. May be fractional, like dynamic_max_distance.
+
+        Returns:
+            The distance, or max_distance + 1 when it exceeds max_distance.
+        """
+        if len(name1) < len(name2):
+            name1, name2 = name2, name1
+
+        if max_distance is None:
+            max_distance = limit = float('inf')
+            band = len(name1) + len(name2)
+        else:
+            limit = max_distance + 1
+            band = int(max_distance) + self.slack(name1, name2)
+            if len(name1) - len(name2) > band:
+                return limit
+
+        width = len(name2)
+        rules_at = self.rules_ending_at(name1)
+        substitution = self.substitution
+        insertion_costs = [self.insertion.get(char2, 1) for char2 in name2]
+        rows = [[0] * (width + 1)]
+        for j in range(1, width + 1):
+            rows[0][j] = min(rows[0][j - 1] + insertion_costs[j - 1], limit) if j <= band else limit
+
+        rows_over_limit = 0
+        for i in range(1, len(name1) + 1):
+            char1 = name1[i - 1]
+            deletion = self.deletion.get(char1, 1)
+            rules = rules_at[i]
+            previous_row = rows[i - 1]
+            current_row = [limit] * (width + 1)
+            current_row[0] = min(previous_row[0] + deletion, limit) if i <= band else limit
+            row_min = current_row[0]
+            for j in range(max(1, i - band), min(width, i + band) + 1):
+                char2 = name2[j - 1]
+                if char1 == char2:
+                    cost = previous_row[j - 1]
+                else:
+                    cost = previous_row[j - 1] + substitution.get((char1, char2), 1)
+                deletion_cost = previous_row[j] + deletion
+                insertion_cost = current_row[j - 1] + insertion_costs[j - 1]
+                if deletion_cost < cost:
+                    cost = deletion_cost
+                if insertion_cost < cost:
+                    cost = insertion_cost
+                for source, target, rule_cost in rules:
+                    if j >= len(target) and name2.endswith(target, 0, j):
+                        rule_total = rows[i - len(source)][j - len(target)] + rule_cost
+                        if rule_total < cost:
+                            cost = rule_total
+                if cost > limit:
+                    cost = limit
+                current_row[j] = cost
+                if cost < row_min:
+                    row_min = cost
+            rows.append(current_row)
+
+            # Every cell derives from earlier rows at most max_rule_length back (plus non-negative
+            # costs), so once that many consecutive rows exceed max_distance, all later rows do too.
+            rows_over_limit = rows_over_limit + 1 if row_min > max_distance else 0
+            if rows_over_limit >= self.max_rule_length:
+                return limit
+
+        return limit if rows[-1][-1] > max_distance else rows[-1][-1]
+
+    def rules_ending_at(self, name: str) -> list:
+        """For every prefix length i of name, the multi-character rules whose source ends at name[:i]."""
+        rules_at = [[] for _ in range(len(name) + 1)]
+        for i in range(1, len(name) + 1):
+            for rule in self.rules_by_last.get(name[i - 1], ()):
+                if i >= len(rule[0]) and name.endswith(rule[0], 0, i):
+                    rules_at[i].append(rule)
+        return rules_at
+
+    def slack(self, name1: str, name2: str) -> int:
+        """
+        Upper bound on how far an alignment can drift from the diagonal without paying for it.
+
+        Each cheap character can be skipped once and each occurrence of a length-changing rule
+        can shift the alignment by its length difference, so the band is widened by that much.
+        """
+        slack = 0
+        for name in (name1, name2):
+            slack += sum(name.count(char) for char in self.cheap_chars)
+            for source, target in self.drifting_rules:
+                slack += name.count(source) * abs(len(source) - len(target))
+        return slack
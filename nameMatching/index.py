@@ -0,0 +1,182 @@
+from collections import Counter
+from itertools import product
+from .distance import colonial_costs, distance as modified_distance
+
+# Variants generated per name are capped; beyond this many digraphs, only all-or-nothing replacement is indexed.
+MAX_DIGRAPH_VARIANTS = 6
+
+
+class NameIndex:
+    """
+    Inverted q-gram index for "all names within distance k of X" queries.
+
+    Names are canonicalized with the zero-cost rules of the cost table: single characters
+    that substitute for free share a class (b/v/u, c/s/z/q, i/y, g/j), characters that are
+    inserted or deleted for free (h) are dropped, and for every digraph rule (ll/y, ph/j) both
+    the kept and the replaced spelling are indexed. The plain edit distance between canonical
+    spellings never exceeds the custom distance between the names, so the q-gram count and
+    length filters on the canonical spellings never drop a true match. Only the postings of the
+    rarest query grams are read (prefix filtering): a spelling that shares enough grams with the
+    query must contain one of them. Every candidate that passes is verified with the exact distance.
+
+    Attributes:
+        cost_dict (dict): The substitution costs the index was built for.
+        distance (callable): Exact distance used to verify candidates.
+        q (int): Gram length.
+    """
+
+    def __init__(self, names=(), cost_dict: dict = colonial_costs, distance=modified_distance, q: int = 2):
+        self.cost_dict = cost_dict
+        self.distance = distance
+        self.q = q
+        self.char_class, self.free_chars, self.digraphs = self.compile_rules(cost_dict)
+        self.items = {}        # name -> list of items stored under it
+        self.variants = []     # variant id -> (name, canonical spelling)
+        self.variant_grams = []  # variant id -> q-gram counts of the canonical spelling
+        self.postings = {}     # gram -> {variant id: count}
+        self.by_length = {}    # canonical length -> set of variant ids
+        self.variant_ids = {}  # name -> list of variant ids
+        for name in names:
+            self.add(name)
+
+    @staticmethod
+    def compile_rules(cost_dict: dict):
+        """
+        Split the cost table into single character classes, free characters and digraph rules.
+
+        Rules costing less than a full edit count as equivalences: the index may then return more
+        candidates, but the exact verification decides.
+        """
+        parent = {}
+
+        def find(char):
+            while parent.setdefault(char, char) != char:
+                char = parent[char]
+            return char
+
+        free_chars, digraphs = set(), set()
+        for (source, target), cost in cost_dict.items():
+            if cost >= 1:
+                continue
+            if len(source) == 1 and len(target) == 1:
+                parent[find(source)] = find(target)
+            elif not source or not target:
+                free_chars.add(source or target)
+            else:
+                long, short = (source, target) if len(source) > len(target) else (target, source)
+                digraphs.add((long, short))
+
+        char_class = {}
+        for char in list(parent):
+            char_class[char] = min(member for member in parent if find(member) == find(char))
+        return char_class, free_chars, sorted(digraphs)
+
+    def canonical_variants(self, name: str) -> set:
+        """All canonical spellings of name: each digraph either kept or replaced, then classes applied."""
+        spellings = {name}
+        for long, short in self.digraphs:
+            expanded = set()
+            for spelling in spellings:
+                parts = spelling.split(long)
+                if len(parts) - 1 > MAX_DIGRAPH_VARIANTS:
+                    expanded.update([spelling, spelling.replace(long, short)])
+                    continue
+                for choice in product([long, short], repeat=len(parts) - 1):
+                    expanded.add(parts[0] + ''.join(joint + part for joint, part in zip(choice, parts[1:])))
+            spellings = expanded
+        return {''.join(self.char_class.get(char, char) for char in spelling if char not in self.free_chars)
+                for spelling in spellings}
+
+    def grams(self, spelling: str) -> Counter:
+        padded = '\x00' * (self.q - 1) + spelling + '\x01' * (self.q - 1)
+        return Counter(padded[i:i + self.q] for i in range(len(padded) - self.q + 1))
+
+    def add(self, name: str, item=None):
+        """Index name, storing item (if given) under it."""
+        if name not in self.items:
+            self.items[name] = []
+            self.variant_ids[name] = []
+            for spelling in self.canonical_variants(name):
+                variant_id = len(self.variants)
+                self.variants.append((name, spelling))
+                self.variant_grams.append(self.grams(spelling))
+                self.variant_ids[name].append(variant_id)
+                self.by_length.setdefault(len(spelling), set()).add(variant_id)
+                for gram, count in self.variant_grams[variant_id].items():
+                    self.postings.setdefault(gram, {})[variant_id] = count
+        if item is not None:
+            self.items[name].append(item)
+
+    def discard(self, name: str, item=None):
+        """Remove item from name, or name with all its items when item is None or was its last item."""
+        if name not in self.items:
+            return
+        if item is not None and item in self.items[name]:
+            self.items[name].remove(item)
+            if self.items[name]:
+                return
+        for variant_id in self.variant_ids.pop(name):
+            _, spelling = self.variants[variant_id]
+            self.variants[variant_id] = (None, spelling)
+            self.by_length[len(spelling)].discard(variant_id)
+            for gram in self.grams(spelling):
+                self.postings[gram].pop(variant_id, None)
+        del self.items[name]
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def candidates(self, name: str, max_distance: int) -> set:
+        """Indexed names that pass the length and q-gram count filters for max_distance; a superset of the matches."""
+        found = set()
+        for spelling in self.canonical_variants(name):
+            query_grams = self.grams(spelling)
+
+            # Padded strings share at least max(len) + q - 1 - q * k grams within distance k.
+            required = {length: max(length, len(spelling)) + self.q - 1 - self.q * max_distance
+                        for length in range(max(0, len(spelling) - max_distance), len(spelling) + max_distance + 1)}
+            for length, length_required in required.items():
+                if length_required <= 0:
+                    found.update(self.variants[variant_id][0] for variant_id in self.by_length.get(length, ()))
+            least_required = min((value for value in required.values() if value > 0), default=None)
+            if least_required is None:
+                continue
+
+            # Any spelling sharing least_required grams contains one of the
+            # len(query) - least_required + 1 rarest query grams.
+            prefix_size = sum(query_grams.values()) - least_required + 1
+            for gram in sorted(query_grams, key=lambda gram: len(self.postings.get(gram, ()))):
+                if prefix_size <= 0:
+                    break
+                prefix_size -= query_grams[gram]
+                for variant_id in self.postings.get(gram, ()):
+                    variant_name, variant_spelling = self.variants[variant_id]
+                    if variant_name in found or required.get(len(variant_spelling), 0) <= 0:
+                        continue
+                    variant_grams = self.variant_grams[variant_id]
+                    shared = sum(min(count, variant_grams[query_gram]) for query_gram, count in query_grams.items()
+                                 if query_gram in variant_grams)
+                    if shared >= required[len(variant_spelling)]:
+                        found.add(variant_name)
+        return found
+
+    def search(self, name: str, max_distance: int) -> list:
+        """
+        Find the indexed names within max_distance of name.
+
+        Args:
+            name (str): The (normalized) name to look up.
+            max_distance (int): Largest distance returned.
+
+        Returns:
+            list: (name, distance) pairs, closest first, ties by name.
+        """
+        matches = []
+        for candidate in self.candidates(name, max_distance):
+            distance = self.distance(name, candidate, self.cost_dict)
+            if distance <= max_distance:
+                matches.append((candidate, distance))
+        return sorted(matches, key=lambda match: (match[1], match[0]))
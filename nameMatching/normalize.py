@@ -0,0 +1,119 @@
+import logging
+import sys
+import pandas as pd
+import unicodedata
+
+# Particles dropped by the family tree builder; matched as plain substrings, like it always has.
+NAME_PARTICLES = ['de ', 'del ', 'de la ', 'y ', 'los ']
+
+
+def normalize(name: str, strip_particles: bool = False):
+    """
+    Normalizes Spanish names by removing diacritics and accents, and replacing
+    'ñ' with 'n'.
+
+    Args:
+        name (str): The original Spanish name.
+        strip_particles (bool): Also collapse whitespace and drop the NAME_PARTICLES, as the
+            family tree builder (newPeopleMatchAlgo) does.
+
+    Returns:
+        str: The normalized Spanish name in lowercase. Missing and non-string values are returned unchanged.
+    """
+
+    if pd.isnull(name) or not isinstance(name, str):
+        return name
+
+    if strip_particles:
+        name = ' '.join(name.split())
+        for prefix in NAME_PARTICLES:
+            name = name.replace(prefix, '')
+
+    unicode_decomp = unicodedata.normalize('NFKD', name)
+
+    normalized_name = ''.join(
+        char for char in unicode_decomp
+        if not unicodedata.combining(char)
+    )
+
+    normalized_name = normalized_name.replace('ñ', 'n').replace('Ñ', 'N')
+
+    return normalized_name.lower()
+
+
+class NormalizationCache:
+    """
+    Memo of normalize results for one strip_particles setting.
+
+    Results are interned, so every occurrence of a normalized name is the same string object;
+    equal names then compare by identity and a tree holds each spelling once. Only strings are
+    memoized, everything else is passed through normalize. When maxsize entries are reached the
+    oldest entry is dropped. Hits and misses are counted per name looked up.
+    """
+
+    def __init__(self, strip_particles: bool = False, maxsize: int = 500000):
+        self.strip_particles = strip_particles
+        self.maxsize = maxsize
+        self.names = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def normalize(self, name):
+        """normalize(name, strip_particles), computed once per distinct string."""
+        normalized = self.names.get(name) if isinstance(name, str) else None
+        if normalized is not None:
+            self.hits += 1
+            return normalized
+        normalized = normalize(name, self.strip_particles)
+        if not isinstance(normalized, str):
+            return normalized
+        self.misses += 1
+        normalized = sys.intern(normalized)
+        if self.maxsize > 0:
+            if len(self.names) >= self.maxsize:
+                del self.names[next(iter(self.names))]
+                self.evictions += 1
+            self.names[name] = normalized
+        return normalized
+
+    def normalize_many(self, names):
+        """
+        Bulk mode for whole columns: each distinct value is looked up once.
+
+        Args:
+            names (iterable or pd.Series): The names to normalize.
+
+        Returns:
+            list, or a pd.Series with the same index when names is a Series.
+        """
+        distinct = {}
+        normalized = []
+        for name in names:
+            if name in distinct:
+                self.hits += isinstance(name, str)
+            else:
+                distinct[name] = self.normalize(name)
+            normalized.append(distinct[name])
+        if isinstance(names, pd.Series):
+            return pd.Series(normalized, index=names.index, dtype=object)
+        return normalized
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.names), 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def log_stats(self, label: str = 'Name normalization cache'):
+        stats = self.stats()
+        logging.info(f"{label}: {stats['hits']} hits, {stats['misses']} misses "
+                     f"({stats['hit_rate']:.1%} hit rate), {stats['size']} entries, {stats['evictions']} evictions")
+
+
+# One cache per strip_particles setting, shared by everything in a process.
+shared_normalization_caches = {False: NormalizationCache(False), True: NormalizationCache(True)}
+
+
+def cached_normalize(name: str, strip_particles: bool = False):
+    """normalize through the shared NormalizationCache of strip_particles."""
+    return shared_normalization_caches[strip_particles].normalize(name)
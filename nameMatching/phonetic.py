@@ -0,0 +1,39 @@
+
+# Phonetic canonical form of the zero-cost rules of colonial_costs: digraphs are rewritten first,
+# then every letter is replaced by the representative of its group and silent h dropped.
+phonetic_digraphs = [('ll', 'y'), ('ph', 'j')]
+phonetic_classes = {'v': 'b', 'u': 'b', 'c': 's', 'z': 's', 'q': 's', 'y': 'i', 'g': 'j'}
+phonetic_silent = {'h'}
+
+
+def phonetic_key(name: str, coarse: bool = False):
+    """
+    Maps a normalized name to a key shared by all spellings that colonial_costs treats as
+    interchangeable, e.g. 'vicente' and 'bisente', or 'llanos' and 'yanos'.
+
+    Args:
+        name (str): A name already passed through normalize.
+        coarse (bool): Also drop everything but letters and collapse repeated letters
+            ('carrillo' and 'carillo'), as the blocking keys of matchVersion1 do.
+
+    Returns:
+        str: The phonetic key, or None for a missing name.
+    """
+    if not isinstance(name, str):
+        return None
+    if coarse:
+        # Collapsed before the digraphs too, so 'villa' keeps the key of 'vila' rather than 'vilia'
+        name = collapse_repeats(char for char in name if char.isalpha())
+    for digraph, replacement in phonetic_digraphs:
+        name = name.replace(digraph, replacement)
+    key = ''.join(phonetic_classes.get(char, char) for char in name if char not in phonetic_silent)
+    return collapse_repeats(key) if coarse else key
+
+
+def collapse_repeats(chars) -> str:
+    """Joins chars, keeping only the first of every run of equal characters."""
+    collapsed = []
+    for char in chars:
+        if not collapsed or collapsed[-1] != char:
+            collapsed.append(char)
+    return ''.join(collapsed)
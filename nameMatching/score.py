@@ -0,0 +1,190 @@
+import logging
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from .batch import batch_distance
+from .distance import bounded_distance, custom_costs
+from .normalize import cached_normalize
+
+
+def calculate_match_probability(levenshtein_distance, max_distance):
+    """
+    Calculates a match probability score based on the Levenshtein distance.
+
+    Args:
+        levenshtein_distance (int): The Levenshtein distance between two names.
+        max_distance (int): The maximum Levenshtein distance considered for matching.
+
+    Returns:
+        float: A probability score between 0 and 1, with 1 being a perfect match
+               and 0 being no match.
+    """
+
+    if levenshtein_distance is None:
+        return 0
+
+    if levenshtein_distance > max_distance:
+        return 0
+
+    return (max_distance - levenshtein_distance) / max_distance
+
+
+def dynamic_max_distance(name1, name2):
+    base_max_distance = 5
+    length_threshold = 8
+    extra_length_factor = 0.2
+
+    max_len = max(len(name1), len(name2))
+
+    if max_len <= length_threshold:
+        return base_max_distance
+    else:
+        extra_length = max_len - length_threshold
+        return base_max_distance + (extra_length * extra_length_factor)
+
+
+def dynamic_max_distance_batch(lengths1, lengths2):
+    """
+    Vectorized dynamic_max_distance over arrays of name lengths.
+
+    Args:
+        lengths1 (np.ndarray): Lengths of the first names.
+        lengths2 (np.ndarray): Lengths of the second names.
+
+    Returns:
+        np.ndarray: The dynamic maximum distance for every pair, as float64.
+    """
+
+    base_max_distance = 5
+    length_threshold = 8
+    extra_length_factor = 0.2
+
+    max_len = np.maximum(lengths1, lengths2)
+    extra_length = np.maximum(max_len - length_threshold, 0)
+    return np.where(max_len <= length_threshold, float(base_max_distance),
+                    base_max_distance + (extra_length * extra_length_factor))
+
+
+def score(name1, name2, cost_dict: dict = custom_costs):
+    """
+    Returns a score for levenshtein distance.
+
+    Args:
+        name1 (str): Given name for matching.
+        name2 (str): Given name for matching.
+        cost_dict (dict): A dictionary of substitution costs {(chars1, chars2): cost}.
+
+    Returns:
+        float: Probability score between 0 and 1 for levenshtein distance matching.
+    """
+    name1 = cached_normalize(str(name1) if not pd.isna(name1) else "")
+    name2 = cached_normalize(str(name2) if not pd.isna(name2) else "")
+
+    dynamic_max = dynamic_max_distance(name1, name2)
+
+    return calculate_match_probability(bounded_distance(name1, name2, dynamic_max, cost_dict), dynamic_max)
+
+
+class NameScoreCache:
+    """
+    Bounded LRU memo of score results keyed on the normalized (name_a, name_b) pair.
+
+    One instance is shared by every PersonMatcher in a process (see shared_name_score_cache), so
+    the direct, mother and father passes and all datasets of a run reuse each other's work.
+    Hits and misses are counted per distinct pair looked up, not per row.
+    """
+
+    def __init__(self, maxsize: int = 200000):
+        self.maxsize = maxsize
+        self.scores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, pairs):
+        """Returns cached scores aligned with pairs (NaN where missing) and the positions that missed."""
+        scores = np.full(len(pairs), np.nan)
+        missing = []
+        for position, pair in enumerate(pairs):
+            score = self.scores.get(pair)
+            if score is None:
+                missing.append(position)
+            else:
+                self.scores.move_to_end(pair)
+                scores[position] = score
+        self.hits += len(pairs) - len(missing)
+        self.misses += len(missing)
+        return scores, np.array(missing, dtype=np.int64)
+
+    def store(self, pairs, scores):
+        if self.maxsize <= 0:
+            return
+        for pair, score in zip(pairs, scores):
+            self.scores[pair] = float(score)
+        while len(self.scores) > self.maxsize:
+            self.scores.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.scores), 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def log_stats(self, label: str = 'Name score cache'):
+        stats = self.stats()
+        logging.info(f"{label}: {stats['hits']} hits, {stats['misses']} misses "
+                     f"({stats['hit_rate']:.1%} hit rate), {stats['size']} entries, {stats['evictions']} evictions")
+
+
+shared_name_score_cache = NameScoreCache()
+
+
+def batch_score(names1, names2, cache: NameScoreCache = None):
+    """
+    Vectorized score. Each distinct pair of normalized names is scored once.
+
+    Args:
+        names1 (sequence): Given names for matching.
+        names2 (sequence): Given names for matching, aligned with names1.
+        cache (NameScoreCache): Optional memo consulted before, and filled after, scoring.
+
+    Returns:
+        np.ndarray: Probability scores between 0 and 1, identical to score.
+    """
+
+    codes1, normalized1 = _normalize_unique(names1)
+    codes2, normalized2 = _normalize_unique(names2)
+    if len(codes1) == 0:
+        return np.zeros(0, dtype=float)
+
+    unique_pairs, pair_codes = np.unique(codes1 * len(normalized2) + codes2, return_inverse=True)
+    unique1 = [normalized1[code] for code in unique_pairs // len(normalized2)]
+    unique2 = [normalized2[code] for code in unique_pairs % len(normalized2)]
+
+    if cache is None:
+        scores = _score_normalized_pairs(unique1, unique2)
+    else:
+        keys = list(zip(unique1, unique2))
+        scores, missing = cache.lookup(keys)
+        if len(missing):
+            computed = _score_normalized_pairs([unique1[i] for i in missing], [unique2[i] for i in missing])
+            scores[missing] = computed
+            cache.store([keys[i] for i in missing], computed)
+
+    return scores[pair_codes]
+
+
+def _score_normalized_pairs(names1, names2):
+    lengths1 = np.fromiter((len(name) for name in names1), dtype=np.int64, count=len(names1))
+    lengths2 = np.fromiter((len(name) for name in names2), dtype=np.int64, count=len(names2))
+    dynamic_max = dynamic_max_distance_batch(lengths1, lengths2)
+    distances = batch_distance(names1, names2, dynamic_max)
+    return np.where(distances > dynamic_max, 0.0, (dynamic_max - distances) / dynamic_max)
+
+
+def _normalize_unique(names):
+    """Codes every name by its normalized form, normalizing each distinct raw value once."""
+    raw_codes, uniques = pd.factorize(pd.Series(list(names), dtype=object), use_na_sentinel=False)
+    normalized = [cached_normalize(str(name) if not pd.isna(name) else "") for name in uniques]
+    normalized_codes, normalized_uniques = pd.factorize(pd.Series(normalized, dtype=object))
+    return normalized_codes[raw_codes], list(normalized_uniques)
@@ -1,8 +1,12 @@
+import heapq
 import logging
 import json
+import os
+from itertools import islice
 from concurrent.futures import ProcessPoolExecutor
 from personReader import get_transformed_data
-from matchingFunctions import modified_levenshtein_distance, normalize_spanish_names
+from matchingFunctions import bounded_levenshtein_distance, normalization_cache, normalize_spanish_names
+from treeIndex import TreeIndex
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -50,6 +54,17 @@ class Node:
 
         logging.debug(f"Created node: {self.name}")
 
+    @classmethod
+    def restore(cls, name, info, timeline):
+        """Recreate a node from its packed state (see pack_tree) without re-normalizing its record."""
+        node = cls.__new__(cls)
+        node.name = name
+        node.father = node.mother = node.spouse = None
+        node.children = set()
+        node.info = info
+        node.timeline = timeline
+        return node
+
     def __hash__(self):
         return hash(self.name)
 
@@ -139,22 +154,39 @@ class Node:
 class Tree:
     def __init__(self):
         self.nodes = set()
+        self.index = TreeIndex()
 
     def add_node(self, new_node: Node):
-        matched = False
-        for node in self.nodes:
-            if match_nodes(node, new_node):
-                node.merge(new_node.info)
-                # Transfer any timeline information
-                for year, data in new_node.timeline.items():
-                    if year not in node.timeline:
-                        node.timeline[year] = data
-                matched = True
-                break
-        if not matched:
-            self.nodes.add(new_node)
+        node = self.first_in_node_order(candidate for candidate in self.index.candidates(new_node, NAME_MATCH_THRESHOLD)
+                                        if match_nodes(candidate, new_node))
+        if node is not None:
+            node.merge(new_node.info)
+            # Transfer any timeline information
+            for year, data in new_node.timeline.items():
+                if year not in node.timeline:
+                    node.timeline[year] = data
+            self.index.refresh(node)
+        else:
+            self.insert(new_node)
         logging.debug(f"Added node to tree: {new_node.name}")
 
+    def insert(self, node: Node):
+        """Add node to the node set and its indexes, unless a node with the same name is already there."""
+        self.nodes.add(node)
+        self.index.add(node)
+
+    def first_in_node_order(self, matches):
+        """
+        The match a full scan of self.nodes would have reached first, or None.
+
+        Only the indexed candidates are compared, but when several of them match, the tie
+        is broken by the iteration order of self.nodes, as the full scan did.
+        """
+        matches = set(matches)
+        if len(matches) <= 1:
+            return next(iter(matches), None)
+        return next(node for node in self.nodes if node in matches)
+
     def link_relationships(self, census_year=None):
         pending_relationships = list(self.nodes)
 
@@ -219,18 +251,18 @@ class Tree:
         normalized_name = normalize_spanish_names(name)
 
         # First try exact name match
-        for node in self.nodes:
-            if node.name == normalized_name:
-                return node
+        node = self.index.get(normalized_name)
+        if node is not None:
+            return node
 
         # Then try fuzzy matching with a threshold
-        for node in self.nodes:
-            if modified_levenshtein_distance(node.name, normalized_name) <= NAME_MATCH_THRESHOLD:
-                return node
+        node = self.first_in_node_order(self.index.similar_names(normalized_name, NAME_MATCH_THRESHOLD))
+        if node is not None:
+            return node
 
         # Create new node if no match
         new_node = Node({"name": name})
-        self.nodes.add(new_node)
+        self.insert(new_node)
         return new_node
 
     def find_matching_nodes(self, node, threshold=2):
@@ -240,7 +272,7 @@ class Tree:
             if candidate is node:
                 continue
 
-            name_distance = modified_levenshtein_distance(node.name, candidate.name)
+            name_distance = bounded_levenshtein_distance(node.name, candidate.name, threshold)
             if name_distance <= threshold:
                 matches.append((candidate, name_distance))
 
@@ -252,7 +284,7 @@ def match_nodes(node1: Node, node2: Node, threshold: int = NAME_MATCH_THRESHOLD)
     Determines if two nodes represent the same person based on name and other attributes.
     """
     # Check name similarity
-    name_distance = modified_levenshtein_distance(node1.name, node2.name)
+    name_distance = bounded_levenshtein_distance(node1.name, node2.name, threshold)
     if name_distance > threshold:
         return False
 
@@ -283,7 +315,7 @@ def match_nodes(node1: Node, node2: Node, threshold: int = NAME_MATCH_THRESHOLD)
     spouse2 = node2.spouse.name if isinstance(node2.spouse, Node) else node2.spouse
 
     if spouse1 and spouse2:
-        spouse_distance = modified_levenshtein_distance(spouse1, spouse2)
+        spouse_distance = bounded_levenshtein_distance(spouse1, spouse2, CENSUS_NAME_THRESHOLD)
         if spouse_distance > CENSUS_NAME_THRESHOLD:
             # Spouses don't match - strong evidence these are different people
             return False
@@ -386,7 +418,7 @@ def validate_child_surname(parent_name, child_name):
     
     # Check if parent's surname appears anywhere in child's name
     for part in child_parts:
-        if modified_levenshtein_distance(part, parent_surname) <= SURNAME_MATCH_THRESHOLD:
+        if bounded_levenshtein_distance(part, parent_surname, SURNAME_MATCH_THRESHOLD) <= SURNAME_MATCH_THRESHOLD:
             return True
             
     # For Spanish naming conventions, check paternal surname inheritance
@@ -395,7 +427,7 @@ def validate_child_surname(parent_name, child_name):
         parent_paternal = parent_parts[-2] if len(parent_parts) >= 3 else parent_parts[-1]
         child_paternal = child_parts[-2] if len(child_parts) >= 3 else child_parts[-1]
         
-        if modified_levenshtein_distance(parent_paternal, child_paternal) <= SURNAME_MATCH_THRESHOLD:
+        if bounded_levenshtein_distance(parent_paternal, child_paternal, SURNAME_MATCH_THRESHOLD) <= SURNAME_MATCH_THRESHOLD:
             return True
     
     logging.warning(f"Suspicious surname pattern: parent={parent_name}, child={child_name}")
@@ -442,6 +474,59 @@ def group_by_household(records):
     return households
 
 
+def census_profile(node):
+    """The fields of a node that cross-census scoring uses: (name, age, spouse name, has spouse)."""
+    spouse_name = node.spouse.name if isinstance(node.spouse, Node) else None
+    return node.name, node.info.get("age"), spouse_name, bool(node.spouse)
+
+
+def census_match_score(person, candidate, years_between):
+    """
+    Score a candidate as the same person as person in another census.
+
+    Args:
+        person: census_profile of the person
+        candidate: census_profile of the candidate
+        years_between: Years between censuses
+
+    Returns:
+        The match score (lower is better), or None if the candidate is not a potential match
+    """
+    name, age, spouse_name, has_spouse = person
+    candidate_name, candidate_age, candidate_spouse_name, candidate_has_spouse = candidate
+
+    # Calculate name similarity; only scores up to CENSUS_NAME_THRESHOLD can produce a match
+    name_score = bounded_levenshtein_distance(name, candidate_name, CENSUS_NAME_THRESHOLD)
+    if name_score > CENSUS_NAME_THRESHOLD:
+        return None
+
+    # Check if ages align
+    age_matches = False
+    if age is not None and candidate_age is not None:
+        expected_age = age + years_between
+        age_diff = abs(expected_age - candidate_age)
+        # Allow some variance in reported ages
+        age_matches = age_diff <= min(3, years_between/2)
+
+    # Check if family members also match
+    family_matches = False
+    if spouse_name is not None and candidate_spouse_name is not None:
+        spouse_score = bounded_levenshtein_distance(spouse_name, candidate_spouse_name, 2)
+        family_matches = spouse_score <= 2
+
+    # Threshold for considering a match
+    if not (name_score <= NAME_MATCH_THRESHOLD or age_matches or family_matches):
+        return None
+
+    # Combine all evidence
+    match_score = name_score
+    if not age_matches:
+        match_score += 5
+    if not family_matches and has_spouse and candidate_has_spouse:
+        match_score += 3
+    return match_score
+
+
 def match_person_across_census(person, other_census_data, years_between):
     """
     Match a person in one census to the same person in another census.
@@ -454,6 +539,7 @@ def match_person_across_census(person, other_census_data, years_between):
     Returns:
         List of (node, score) tuples of potential matches, sorted by score
     """
+    profile = census_profile(person)
     matches = []
 
     for candidate in other_census_data:
@@ -461,95 +547,200 @@ def match_person_across_census(person, other_census_data, years_between):
         if person is candidate:
             continue
 
-        # Calculate name similarity
-        name_score = modified_levenshtein_distance(person.name, candidate.name)
-
-        # Check if ages align
-        age_matches = False
-        if person.info.get("age") is not None and candidate.info.get("age") is not None:
-            expected_age = person.info["age"] + years_between
-            age_diff = abs(expected_age - candidate.info["age"])
-            # Allow some variance in reported ages
-            age_matches = age_diff <= min(3, years_between/2)
-
-        # Check if family members also match
-        family_matches = False
-        if isinstance(person.spouse, Node) and isinstance(candidate.spouse, Node):
-            spouse_score = modified_levenshtein_distance(person.spouse.name, candidate.spouse.name)
-            family_matches = spouse_score <= 2
-
-        # Combine all evidence
-        match_score = name_score
-        if not age_matches:
-            match_score += 5
-        if not family_matches and person.spouse and candidate.spouse:
-            match_score += 3
-
-        # Threshold for considering a match
-        if name_score <= NAME_MATCH_THRESHOLD or (name_score <= CENSUS_NAME_THRESHOLD and (age_matches or family_matches)):
+        match_score = census_match_score(profile, census_profile(candidate), years_between)
+        if match_score is not None:
             matches.append((candidate, match_score))
 
     return sorted(matches, key=lambda x: x[1])
 
 
+def score_census_shard(profiles, excluded, candidates, offset, years_between, top_k):
+    """
+    Worker task: score every person against one contiguous shard of the other census.
+
+    Args:
+        profiles: census_profile of each person
+        excluded: For each person, the indexes of that same node in the other census
+        candidates: census_profile of each candidate in the shard
+        offset: Index of the shard's first candidate in the other census
+        years_between: Years between censuses
+        top_k: Keep only the k best matches per person, or None to keep all
+
+    Returns:
+        For each person, a list of (score, candidate index) sorted by score, then index
+    """
+    results = []
+    for profile, skip in zip(profiles, excluded):
+        matches = []
+        for index, candidate in enumerate(candidates, offset):
+            if index in skip:
+                continue
+            match_score = census_match_score(profile, candidate, years_between)
+            if match_score is not None:
+                matches.append((match_score, index))
+        matches.sort()
+        results.append(matches if top_k is None else matches[:top_k])
+    return results
+
+
+def match_persons_across_census(persons, other_census_data, years_between, top_k=None, max_workers=None):
+    """
+    match_person_across_census for many persons at once, with the other census split into
+    shards that are scored in parallel worker processes.
+
+    Each shard keeps its own top_k per person; the shards are merged by (score, candidate index),
+    so every list is ordered exactly like match_person_across_census's (sorted by score, ties in
+    other_census_data order), truncated to top_k.
+
+    Args:
+        persons: List of Node objects from one census
+        other_census_data: List of Node objects from another census
+        years_between: Years between censuses
+        top_k: Number of best matches to return per person, or None for all of them
+        max_workers: Number of worker processes (and shards); defaults to the number of CPUs
+
+    Returns:
+        List with, for each person, the list of (node, score) tuples of potential matches, sorted by score
+    """
+    other_census_data = list(other_census_data)
+    positions = {}
+    for index, candidate in enumerate(other_census_data):
+        positions.setdefault(id(candidate), set()).add(index)
+    profiles = [census_profile(person) for person in persons]
+    excluded = [positions.get(id(person), set()) for person in persons]
+    candidates = [census_profile(candidate) for candidate in other_census_data]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    shard_size = max(1, -(-len(candidates) // max_workers))
+    offsets = range(0, len(candidates), shard_size)
+
+    if len(offsets) <= 1:
+        shards = [score_census_shard(profiles, excluded, candidates, 0, years_between, top_k)]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(score_census_shard, profiles, excluded, candidates[offset:offset + shard_size],
+                                       offset, years_between, top_k)
+                       for offset in offsets]
+            shards = [future.result() for future in futures]
+
+    results = []
+    for person_shards in zip(*shards):
+        merged = list(islice(heapq.merge(*person_shards), top_k))
+        results.append([(other_census_data[index], match_score) for match_score, index in merged])
+    return results
+
+
+def build_census_tree(dataset_name, records):
+    """Build and link the family tree of a single census dataset."""
+    # Filter out records with no name before processing
+    records = [record for record in records if record.get("name") and record.get("name").strip()]
+
+    tree = Tree()
+
+    if dataset_name == "padron_1821":
+        # Group by household for more accurate family linkage
+        households = group_by_household(records)
+        for household in households:
+            for record in household:
+                new_node = Node(record, dataset_name)
+                tree.add_node(new_node)
+    else:
+        for record in records:
+            new_node = Node(record, dataset_name)
+            tree.add_node(new_node)
+
+    # Special handling for 1790 census child references
+    if dataset_name == "1790_census":
+        for record in records:
+            parent_node = tree.index.get(normalize_spanish_names(record.get("name")))
+
+            if parent_node:
+                for i in range(1, 15):
+                    child_name = record.get(f"Child{i}")
+                    if child_name:
+                        child_node = tree.find_or_create_node(child_name)
+
+                        if parent_node.info.get("gender") == "male":
+                            child_node.father = parent_node
+                        else:
+                            child_node.mother = parent_node
+
+                        parent_node.children.add(child_node)
+
+    # Link relationships within this census
+    census_year = CENSUS_YEARS.get(dataset_name)
+    tree.link_relationships(census_year)
+    return tree
+
+
 def build_family_trees_by_census():
     data = get_transformed_data()
     trees_by_census = {}
 
     with ProcessPoolExecutor() as executor:
-        futures = {dataset_name: executor.submit(process_records, records)
-                  for dataset_name, records in data.items()}
+        # Largest censuses first, so they are not the last to start
+        futures = {dataset_name: executor.submit(build_packed_census_tree, dataset_name, data[dataset_name])
+                   for dataset_name in sorted(data, key=lambda name: len(data[name]), reverse=True)}
 
-        for dataset_name, future in futures.items():
-            result = future.result()
-            
-            # Filter out records with no name before processing
-            result = [record for record in result if record.get("name") and record.get("name").strip()]
-            
-            tree = Tree()
-
-            if dataset_name == "padron_1821":
-                # Group by household for more accurate family linkage
-                households = group_by_household(result)
-                for household in households:
-                    for record in household:
-                        new_node = Node(record, dataset_name)
-                        tree.add_node(new_node)
-            else:
-                for record in result:
-                    new_node = Node(record, dataset_name)
-                    tree.add_node(new_node)
-
-            # Special handling for 1790 census child references
-            if dataset_name == "1790_census":
-                for record in result:
-                    parent_node = None
-                    for node in tree.nodes:
-                        if node.name == normalize_spanish_names(record.get("name")):
-                            parent_node = node
-                            break
-
-                    if parent_node:
-                        for i in range(1, 15):
-                            child_name = record.get(f"Child{i}")
-                            if child_name:
-                                child_node = tree.find_or_create_node(child_name)
-
-                                if parent_node.info.get("gender") == "male":
-                                    child_node.father = parent_node
-                                else:
-                                    child_node.mother = parent_node
-
-                                parent_node.children.add(child_node)
-
-            # Link relationships within this census
-            census_year = CENSUS_YEARS.get(dataset_name)
-            tree.link_relationships(census_year)
-            trees_by_census[dataset_name] = tree
+        for dataset_name in data:
+            trees_by_census[dataset_name] = unpack_tree(futures[dataset_name].result())
 
     return trees_by_census
 
 
+def build_packed_census_tree(dataset_name, records):
+    """Worker task: build the census tree of one dataset and return it packed."""
+    logging.info(f"Building {dataset_name} tree from {len(records)} records in worker process")
+    tree = build_census_tree(dataset_name, records)
+    normalization_cache.log_stats(f"Name normalization after {dataset_name}")
+    return pack_tree(tree)
+
+
+def pack_reference(reference):
+    """A father, mother, spouse or child reference: a Node becomes a (name,) tuple, unresolved names stay strings."""
+    return (reference.name,) if isinstance(reference, Node) else reference
+
+
+def unpack_reference(reference, nodes_by_name):
+    return nodes_by_name[reference[0]] if isinstance(reference, tuple) else reference
+
+
+def pack_tree(tree):
+    """
+    Compact, picklable form of a tree: one tuple per node, in the order the nodes were inserted,
+    with relationships given by node name instead of object references.
+
+    Pickling the Node graph itself would recurse through every relationship and rebuild
+    the node sets before the nodes' names are restored.
+    """
+    return [(node.name, node.info, node.timeline, pack_reference(node.father),
+             pack_reference(node.mother), pack_reference(node.spouse),
+             [pack_reference(child) for child in node.children])
+            for node in tree.index.by_name.values()]
+
+
+def unpack_tree(packed):
+    """
+    Rebuild a Tree from pack_tree output.
+
+    Nodes are inserted in their original order, so the node set iterates in the same order as
+    the tree that was packed, given the same string hashes, and first-match decisions that
+    depend on that order come out the same.
+    """
+    tree = Tree()
+    for name, info, timeline, *_ in packed:
+        tree.insert(Node.restore(name, info, timeline))
+
+    nodes_by_name = tree.index.by_name
+    for name, _, _, father, mother, spouse, children in packed:
+        node = nodes_by_name[name]
+        node.father = unpack_reference(father, nodes_by_name)
+        node.mother = unpack_reference(mother, nodes_by_name)
+        node.spouse = unpack_reference(spouse, nodes_by_name)
+        node.children.update(unpack_reference(child, nodes_by_name) for child in children)
+    return tree
+
+
 def integrate_trees(trees_by_census):
     """
     Integrate trees from multiple census years into a consolidated view.
@@ -576,60 +767,60 @@ def integrate_trees(trees_by_census):
 
         current_tree = trees_by_census[current_census]
 
+        index_stats = master_tree.index.stats()
+
         # Try to match people across censuses
         for current_node in current_tree.nodes:
             matched = False
 
-            # Try to find this person in the master tree
-            matches = []
-            for master_node in master_tree.nodes:
-                match_score = match_nodes(master_node, current_node, threshold=2)
-                if match_score:
-                    matches.append((master_node, match_score))
-
-            if matches:
-                # Get best match
-                best_match = min(matches, key=lambda x: x[1]) if matches else None
-                if best_match:
-                    matched = True
-                    master_node = best_match[0]
-
-                    # Merge the information from current census
-                    master_node.merge_timeline(current_node, current_year)
-
-                    # Update relationships
-                    if current_node.spouse and not master_node.spouse:
-                        # Try to find spouse in master tree
-                        spouse_node = None
-                        for node in master_tree.nodes:
-                            if isinstance(current_node.spouse, Node) and match_nodes(node, current_node.spouse):
-                                spouse_node = node
-                                break
-
-                        if not spouse_node and isinstance(current_node.spouse, Node):
-                            # Add the spouse to master tree
-                            master_tree.add_node(current_node.spouse)
-                            spouse_node = current_node.spouse
-
-                        if spouse_node:
-                            master_node.spouse = spouse_node
-                            spouse_node.spouse = master_node
+            # Try to find this person in the master tree, scoring only the candidates blocking keeps:
+            # names within the threshold, compatible sex and birth-year window.
+            # Every match scores True, so the best match is the first one in node order.
+            master_node = master_tree.first_in_node_order(
+                candidate for candidate in master_tree.index.candidates(current_node, 2)
+                if match_nodes(candidate, current_node, threshold=2))
+
+            if master_node is not None:
+                matched = True
+
+                # Merge the information from current census
+                master_node.merge_timeline(current_node, current_year)
+                master_tree.index.refresh(master_node)
+
+                # Update relationships
+                if current_node.spouse and not master_node.spouse:
+                    # Try to find spouse in master tree
+                    spouse_node = None
+                    if isinstance(current_node.spouse, Node):
+                        spouse_node = master_tree.first_in_node_order(
+                            candidate for candidate in master_tree.index.candidates(current_node.spouse, NAME_MATCH_THRESHOLD)
+                            if match_nodes(candidate, current_node.spouse))
+
+                    if not spouse_node and isinstance(current_node.spouse, Node):
+                        # Add the spouse to master tree
+                        master_tree.add_node(current_node.spouse)
+                        spouse_node = current_node.spouse
+
+                    if spouse_node:
+                        master_node.spouse = spouse_node
+                        spouse_node.spouse = master_node
 
             # If not matched, add as new person
             if not matched:
                 master_tree.add_node(current_node)
 
+        evaluated = master_tree.index.pairs_evaluated - index_stats['evaluated']
+        pruned = master_tree.index.pairs_pruned - index_stats['pruned']
+        logging.info(f"Integrating {current_census}: {evaluated} candidate pairs evaluated, {pruned} pruned by blocking")
+
+    master_tree.index.log_stats("Master tree blocking")
+
     # Final relationship linking
     master_tree.link_relationships()
 
     return master_tree
 
 
-def process_records(records):
-    logging.info(f"Processing {len(records)} records in worker process")
-    return records
-
-
 def save_family_trees(tree, filename="family_trees.json"):
     """Saves consolidated family tree in a nested JSON structure with proper ID references."""
     people_lookup = {}
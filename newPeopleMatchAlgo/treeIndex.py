@@ -0,0 +1,100 @@
+import logging
+from numbers import Number
+from matchingFunctions import NameIndex, custom_costs
+
+# Width in years of a birth-year bucket; match_nodes allows birth years up to 5 years apart.
+BIRTH_YEAR_BUCKET = 5
+BIRTH_YEAR_TOLERANCE = 5
+
+# Key of the nodes whose gender or birth year is missing or not a single value; they are compatible with everyone.
+ANY = None
+
+
+class TreeIndex:
+    """
+    Secondary indexes over the nodes of a Tree, so a node is only compared with plausible candidates.
+
+    Nodes are indexed by normalized name (exact dict and fuzzy NameIndex) and filed under their
+    gender and birth-year bucket, which filter the name candidates. The gender and birth-year
+    keys are taken when a node is added or refreshed, so the Tree must call refresh after
+    anything that changes a node's info or timeline.
+    Candidates are a superset of the nodes match_nodes can accept: a node with an unknown or
+    ambiguous gender or birth year is a candidate for everyone.
+    """
+
+    def __init__(self, cost_dict: dict = custom_costs):
+        self.by_name = {}
+        self.names = NameIndex(cost_dict=cost_dict)
+        self.keys = {}  # node name -> (gender key, birth bucket) it is filed under
+        self.pairs_evaluated = 0
+        self.pairs_pruned = 0
+
+    def __contains__(self, node):
+        return node.name in self.by_name
+
+    def __len__(self):
+        return len(self.by_name)
+
+    @staticmethod
+    def gender_key(node):
+        gender = node.info.get("gender")
+        return gender if isinstance(gender, str) and gender else ANY
+
+    @staticmethod
+    def birth_year(node):
+        birth_year = node.get_estimated_birth_year()
+        return birth_year if isinstance(birth_year, Number) and birth_year else None
+
+    def birth_bucket(self, node):
+        birth_year = self.birth_year(node)
+        return ANY if birth_year is None else int(birth_year // BIRTH_YEAR_BUCKET)
+
+    def add(self, node):
+        """Index node; a node whose name is already indexed is ignored, like Tree.nodes does."""
+        if node.name in self.by_name:
+            return
+        self.by_name[node.name] = node
+        self.names.add(node.name)
+        self.keys[node.name] = (self.gender_key(node), self.birth_bucket(node))
+
+    def refresh(self, node):
+        """Re-file node under its current gender and birth year after a merge."""
+        if self.by_name.get(node.name) is node:
+            self.keys[node.name] = (self.gender_key(node), self.birth_bucket(node))
+
+    def get(self, name: str):
+        """The node with exactly this normalized name, or None."""
+        return self.by_name.get(name)
+
+    def similar_names(self, name: str, max_distance: int) -> list:
+        """Nodes whose name is within max_distance of name, closest first."""
+        return [self.by_name[match] for match, _ in self.names.search(name, max_distance)]
+
+    def candidates(self, node, max_distance: int) -> list:
+        """
+        Indexed nodes that match_nodes(candidate, node, max_distance) may accept: names within
+        max_distance, with a compatible gender and a birth year in the window around node's.
+        """
+        candidates = self.similar_names(node.name, max_distance)
+        gender = self.gender_key(node)
+        if gender is not ANY:
+            candidates = [candidate for candidate in candidates if self.keys[candidate.name][0] in (gender, ANY)]
+        birth_year = self.birth_year(node)
+        if birth_year is not None:
+            first = int((birth_year - BIRTH_YEAR_TOLERANCE) // BIRTH_YEAR_BUCKET)
+            last = int((birth_year + BIRTH_YEAR_TOLERANCE) // BIRTH_YEAR_BUCKET)
+            candidates = [candidate for candidate in candidates
+                          if self.keys[candidate.name][1] is ANY or first <= self.keys[candidate.name][1] <= last]
+        self.pairs_evaluated += len(candidates)
+        self.pairs_pruned += len(self) - len(candidates)
+        return candidates
+
+    def stats(self) -> dict:
+        pairs = self.pairs_evaluated + self.pairs_pruned
+        return {'evaluated': self.pairs_evaluated, 'pruned': self.pairs_pruned,
+                'pruned_rate': self.pairs_pruned / pairs if pairs else 0.0}
+
+    def log_stats(self, label: str = 'Tree index'):
+        stats = self.stats()
+        logging.info(f"{label}: {stats['evaluated']} pairs evaluated, {stats['pruned']} pruned "
+                     f"({stats['pruned_rate']:.1%} of all pairs)")